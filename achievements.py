@@ -1,62 +1,78 @@
+import logging
 import os
-from datetime import datetime, timedelta
+from bisect import bisect_right
+from datetime import datetime
 from dotenv import load_dotenv
+import storage
 from funny_content import FUNNY_STREAK_MESSAGES, FUNNY_ACHIEVEMENT_REACTIONS
+from user_stats import current_streak, get_user_stats, summarize
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
 # Supabase client will be passed in as parameter
 supabase = None
 
-# Achievement definitions
+# Achievement definitions. Each one is earned when a running counter from
+# the per-user aggregate summary (see user_stats.summarize) reaches its
+# threshold.
 ACHIEVEMENTS = {
     "first_bloom": {
         "name": "First Bloom",
         "description": "Create your first plant",
         "emoji": "🌱",
-        "condition": lambda plants: len(plants) >= 1
+        "counter": "total_plants",
+        "threshold": 1
     },
     "green_thumb": {
         "name": "Green Thumb",
         "description": "Create 10 plants",
         "emoji": "👍",
-        "condition": lambda plants: len(plants) >= 10
+        "counter": "total_plants",
+        "threshold": 10
     },
     "master_gardener": {
         "name": "Master Gardener",
         "description": "Create 50 plants",
         "emoji": "🌳",
-        "condition": lambda plants: len(plants) >= 50
+        "counter": "total_plants",
+        "threshold": 50
     },
     "color_collector": {
         "name": "Color Collector",
         "description": "Collect all 7 colors",
         "emoji": "🎨",
-        "condition": lambda plants: len(set(p.get("color") for p in plants)) >= 7
+        "counter": "unique_colors",
+        "threshold": 7
     },
     "leaf_scientist": {
         "name": "Leaf Scientist",
         "description": "Unlock all 3 leaf types",
         "emoji": "🔬",
-        "condition": lambda plants: len(set(p.get("leaf_type") for p in plants)) >= 3
+        "counter": "unique_leaf_types",
+        "threshold": 3
     },
     "consistent_grower": {
         "name": "Consistent Grower",
         "description": "Maintain 7-day streak",
         "emoji": "🔥",
-        "condition": lambda plants, streak=None: streak >= 7 if streak else False
+        "counter": "streak",
+        "threshold": 7
     },
     "tower_builder": {
         "name": "Tower Builder",
         "description": "Create a plant taller than 300px",
         "emoji": "🏢",
-        "condition": lambda plants: any(p.get("height", 0) >= 300 for p in plants)
+        "counter": "tallest_plant",
+        "threshold": 300
     },
     "tiny_gardener": {
         "name": "Tiny Gardener",
         "description": "Create 100 plants",
         "emoji": "🌿",
-        "condition": lambda plants: len(plants) >= 100
+        "counter": "total_plants",
+        "threshold": 100
     }
 }
 
@@ -68,85 +84,107 @@ def get_user_achievements(sb, user_id):
             "*").eq("user_id", user_id).execute()
         return response.data or []
     except Exception as e:
-        print(f"Error fetching achievements: {str(e)}")
+        log.error("Error fetching achievements: %s", e)
         return []
 
 
-def check_and_award_achievements(sb, user_id, plants, current_streak=0):
-    """Check which achievements user qualifies for and award new ones"""
-    try:
-        # Get existing achievements
-        existing = get_user_achievements(sb, user_id)
-        existing_ids = {a["achievement_id"] for a in existing}
+# Counter name -> ([thresholds ascending], [matching achievement ids])
+THRESHOLD_INDEX = {}
+for _threshold, _achievement_id, _counter in sorted(
+        (info["threshold"], achievement_id, info["counter"])
+        for achievement_id, info in ACHIEVEMENTS.items()):
+    _thresholds, _ids = THRESHOLD_INDEX.setdefault(_counter, ([], []))
+    _thresholds.append(_threshold)
+    _ids.append(_achievement_id)
+
+
+def crossed_achievements(before, after):
+    """Achievement ids whose threshold lies in (before, after] for a counter.
+
+    Only counters that actually moved are looked at, and bisect finds the
+    crossed thresholds directly, so an event that crosses nothing costs
+    O(number of counters) with no I/O at all.
+    """
+    crossed = []
+    for counter, (thresholds, achievement_ids) in THRESHOLD_INDEX.items():
+        old_value = (before or {}).get(counter) or 0
+        new_value = (after or {}).get(counter) or 0
+        if new_value <= old_value:
+            continue
+        start = bisect_right(thresholds, old_value)
+        end = bisect_right(thresholds, new_value)
+        crossed.extend(achievement_ids[start:end])
+    return crossed
+
+
+def _achievement_row(user_id, achievement_id):
+    achievement_info = ACHIEVEMENTS[achievement_id]
+    return {
+        "user_id": user_id,
+        "achievement_id": achievement_id,
+        "name": achievement_info["name"],
+        "description": achievement_info["description"],
+        "emoji": achievement_info["emoji"],
+        "earned_at": datetime.utcnow().isoformat()
+    }
 
-        # Get current plants for calculations
-        user_plants = plants if isinstance(plants, list) else []
-
-        new_achievements = []
-
-        for achievement_id, achievement_info in ACHIEVEMENTS.items():
-            # Skip if already earned
-            if achievement_id in existing_ids:
-                continue
-
-            # Check condition
-            try:
-                if achievement_id == "consistent_grower":
-                    condition_met = achievement_info["condition"](
-                        user_plants, streak=current_streak)
-                else:
-                    condition_met = achievement_info["condition"](user_plants)
-            except:
-                condition_met = False
-
-            # Award if condition met
-            if condition_met:
-                new_achievements.append({
-                    "user_id": user_id,
-                    "achievement_id": achievement_id,
-                    "name": achievement_info["name"],
-                    "description": achievement_info["description"],
-                    "emoji": achievement_info["emoji"],
-                    "earned_at": datetime.utcnow().isoformat()
-                })
-
-        # Insert new achievements
-        if new_achievements:
-            sb.table("user_achievements").insert(
-                new_achievements).execute()
 
-        return new_achievements
+def award_achievements(sb, user_id, achievement_ids):
+    """Insert achievements, skipping ones the user already has.
+
+    Relies on UNIQUE(user_id, achievement_id) so concurrent awards cannot
+    duplicate; returns only the rows that were newly inserted.
+    """
+    if not achievement_ids:
+        return []
+    try:
+        response = sb.table("user_achievements").upsert(
+            [_achievement_row(user_id, a) for a in achievement_ids],
+            on_conflict="user_id,achievement_id",
+            ignore_duplicates=True).execute()
+        return response.data or []
     except Exception as e:
-        print(f"Error awarding achievements: {str(e)}")
+        log.error("Error awarding achievements: %s", e)
         return []
 
 
-def get_user_streak(sb, user_id):
-    """Calculate user's current streak"""
-    try:
-        response = sb.table("plants").select(
-            "created_at").eq("user_id", user_id).order("created_at", desc=True).execute()
+def award_for_event(sb, user_id, before, after):
+    """Award achievements crossed by a plant-creation (or streak) event.
 
-        if not response.data:
-            return 0
+    `before` and `after` are the user's aggregate summaries around the
+    event (user_stats.summarize).
+    """
+    return award_achievements(sb, user_id, crossed_achievements(before, after))
 
-        plants = response.data
-        today = datetime.utcnow().date()
-        current_streak = 0
 
-        for plant in plants:
-            plant_date = datetime.fromisoformat(
-                plant["created_at"].replace("Z", "+00:00")).date()
-            expected_date = today - timedelta(days=current_streak)
+def check_and_award_achievements(sb, user_id, stats, current_streak=0):
+    """Full check of every achievement against a user's summary.
 
-            if plant_date == expected_date:
-                current_streak += 1
-            elif current_streak > 0:
-                break
+    The event path (award_for_event) only looks at crossed thresholds;
+    this is the repair/backfill path for users whose achievements predate
+    it. `stats` is the user's aggregate summary (user_stats.summarize).
+    """
+    try:
+        # Get existing achievements
+        existing = get_user_achievements(sb, user_id)
+        existing_ids = {a["achievement_id"] for a in existing}
 
-        return current_streak
+        summary = dict(stats, streak=current_streak)
+        earned = [achievement_id
+                  for achievement_id in crossed_achievements({}, summary)
+                  if achievement_id not in existing_ids]
+        return award_achievements(sb, user_id, earned)
     except Exception as e:
-        print(f"Error calculating streak: {str(e)}")
+        log.error("Error awarding achievements: %s", e)
+        return []
+
+
+def get_user_streak(sb, user_id):
+    """Get user's current streak from their stats row (no history scan)"""
+    try:
+        return current_streak(get_user_stats(sb, user_id))
+    except Exception as e:
+        log.error("Error calculating streak: %s", e)
         return 0
 
 
@@ -173,11 +211,39 @@ def create_achievements_table():
             ON user_achievements FOR SELECT
             USING (auth.uid() = user_id);
         """
-        print("Run this in Supabase SQL Editor:")
-        print(sql)
+        log.info("Run this in Supabase SQL Editor:\n%s", sql)
     except Exception as e:
-        print(f"Error: {str(e)}")
+        log.error("Error: %s", e)
+
+
+def backfill_achievements(sb):
+    """Run the full achievement check for every user with stats.
+
+    Returns {user_id: [newly awarded achievement rows]}.
+    """
+    rows = storage.fetch_all(
+        lambda: sb.table("user_stats").select("*").order("user_id"))
+    awarded = {}
+    for row in rows:
+        summary = summarize(row)
+        new_achievements = check_and_award_achievements(
+            sb, row["user_id"], summary, current_streak=summary["streak"])
+        if new_achievements:
+            awarded[row["user_id"]] = new_achievements
+    return awarded
 
 
 if __name__ == "__main__":
-    create_achievements_table()
+    import sys
+    import log_config
+    log_config.configure()
+    if "--backfill" in sys.argv:
+        # Awarding other users' achievements needs a key that bypasses RLS
+        client = storage.connect(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY"))
+        awarded = backfill_achievements(client)
+        log.info("Awarded %d achievements to %d users",
+                 sum(len(a) for a in awarded.values()), len(awarded))
+    else:
+        create_achievements_table()
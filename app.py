@@ -1,28 +1,145 @@
 import os
 import base64
+import inspect
 import json
+import logging
 import random
-import jwt
+import time
 from io import BytesIO
 from datetime import datetime, timedelta
 from functools import wraps
 from dotenv import load_dotenv
 from flask import Flask, render_template, request, jsonify, Response
-from PIL import Image
-from supabase import create_client, Client
-from achievements import check_and_award_achievements, get_user_achievements, get_user_streak
-from funny_content import DAILY_CHALLENGES, MINI_GAMES, FUNNY_NOTIFICATIONS, COSMETICS_SHOP, FUNNY_STREAK_MESSAGES
+from auth import claim_cache, event_tickets, user_from_header
+import storage
+import log_config
+import metrics
+import query_cache
+from query_cache import CachedClient
+from response_cache import SharedResponseCache
+from fanout import gather_io, run_concurrently, run_io
+from doodle_analysis import DoodleTooLarge
+from doodle_pool import (DoodlePoolBusy, DoodlePoolTimeout, analyze_doodle, pool_stats, start_pool, submit_many,
+                         wait_for_doodle)
+from doodle_pool import capacity as pool_capacity
+from user_stats import get_user_stats, record_plants, summarize
+from credit_ledger import (achievement_entries, buy_cosmetic, calculate_total_credits, credits_breakdown, get_balance,
+                           minigame_entry, plant_entries, post_entries, total_credits)
+import challenge_progress
+import garden_events
+from plant_pages import (MAX_PAGE_SIZE, InvalidPageRequest, encode_cursor, fetch_page, fetch_since, garden_version,
+                         last_modified, parse_fields, parse_limit, version_etag)
+import leaderboard as leaderboards
+from achievements import award_for_event, get_user_achievements
+from funny_content import MINI_GAMES, FUNNY_NOTIFICATIONS, COSMETICS_SHOP, FUNNY_STREAK_MESSAGES
 
 # Load environment variables
 load_dotenv()
+log_config.configure()
+
+log = logging.getLogger("app")
+# Full plant payloads and database responses (off unless LOG_PAYLOADS=1)
+payload_log = logging.getLogger(log_config.PAYLOAD_LOGGER)
 
 # Initialize Flask app
 app = Flask(__name__)
 
-# Initialize Supabase client with ANON key
+# Reject oversized request bodies before they are read (doodle uploads)
+app.config["MAX_CONTENT_LENGTH"] = int(
+    os.getenv("MAX_UPLOAD_BYTES", str(16 * 1024 * 1024)))
+
+# Initialize Supabase client (STORAGE_BACKEND=sqlite runs offline instead,
+# see storage.py). Credit ledger writes go through database functions only
+# the service role may call (SETUP_GUIDE.md), so that key is preferred.
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+if storage.BACKEND == "supabase" and not SUPABASE_SERVICE_ROLE_KEY:
+    log.warning("SUPABASE_SERVICE_ROLE_KEY is not set: credit ledger writes will fail "
+                "and /credits will recompute balances on every request")
+# Reads are memoized per request (see query_cache.py)
+supabase = CachedClient(storage.connect(
+    SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY))
+
+def metrics_endpoint():
+    """URL rule of the current request, e.g. "/plants" (bounded label set)"""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@app.before_request
+def start_request_log():
+    """Log this request under its X-Request-ID (or a new ID)"""
+    request_id, token = log_config.set_request_id(request.headers.get("X-Request-ID"))
+    request.environ["log.request_id"] = request_id
+    request.environ["log.token"] = token
+
+
+@app.before_request
+def open_query_cache():
+    """Give every request its own read cache"""
+    request.environ["query_cache.token"] = query_cache.begin_request()
+
+
+@app.before_request
+def start_request_metrics():
+    if metrics.ENABLED:
+        request.environ["metrics.started"] = time.perf_counter()
+        request.environ["metrics.endpoint"] = metrics_endpoint()
+        metrics.IN_FLIGHT.inc(request.environ["metrics.endpoint"])
+
+
+@app.after_request
+def report_query_cache(response):
+    """Expose per-request cache hit/miss counters"""
+    stats = query_cache.current_stats()
+    if stats:
+        response.headers["X-Query-Cache"] = \
+            f"hits={stats['hits']}; misses={stats['misses']}"
+        if metrics.ENABLED:
+            metrics.QUERY_CACHE_READS.inc("hit", amount=stats["hits"])
+            metrics.QUERY_CACHE_READS.inc("miss", amount=stats["misses"])
+    return response
+
+
+@app.after_request
+def add_request_id(response):
+    request_id = request.environ.get("log.request_id")
+    if request_id:
+        response.headers["X-Request-ID"] = request_id
+    return response
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get("metrics.started")
+    if started is not None:
+        metrics.observe_request(request.environ["metrics.endpoint"], request.method,
+                                response.status_code, time.perf_counter() - started)
+    return response
+
+
+@app.teardown_request
+def close_query_cache(_error=None):
+    token = request.environ.pop("query_cache.token", None)
+    if token is not None:
+        query_cache.end_request(token)
+
+
+@app.teardown_request
+def finish_request_log(_error=None):
+    token = request.environ.pop("log.token", None)
+    if token is not None:
+        log_config.reset_request_id(token)
+
+
+@app.teardown_request
+def finish_request_metrics(_error=None):
+    if request.environ.pop("metrics.started", None) is not None:
+        metrics.IN_FLIGHT.dec(request.environ["metrics.endpoint"])
+
+
+# Warm-start the doodle analysis process pool (no-op unless DOODLE_POOL_WORKERS > 0)
+start_pool()
 
 # Plant generation constants
 LEAF_TYPES = ["round", "sharp", "heart"]
@@ -38,127 +155,305 @@ GREEN_COLORS = [
 
 
 # ========== AUTH HELPERS ==========
-def get_user_from_token(token):
-    """Decode JWT token and extract user info without server verification"""
-    if not token:
-        return None
-
-    try:
-        # Remove 'Bearer ' prefix if present
-        if token.startswith('Bearer '):
-            token = token[7:]
+def authenticate():
+    """(User, None) for the request's bearer token, or (None, error response)"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None, (jsonify({"error": "Unauthorized"}), 401)
 
-        # Decode JWT without verification (we trust Supabase's token)
-        # The token was issued by Supabase, so we can trust its contents
-        decoded = jwt.decode(token, options={"verify_signature": False})
-
-        # Extract user info from token
-        if 'sub' in decoded:  # 'sub' is the user ID in Supabase JWTs
-            class User:
-                def __init__(self, user_id, email):
-                    self.id = user_id
-                    self.email = email
-
-            return User(decoded['sub'], decoded.get('email', ''))
-
-        return None
-    except Exception as e:
-        print(f"Token decoding error: {str(e)}")
-        return None
+    user = user_from_header(auth_header)
+    if not user:
+        return None, (jsonify({"error": "Invalid token"}), 401)
+    return user, None
 
 
 def require_auth(f):
-    """Decorator to require authentication for routes"""
+    """Decorator to require authentication for routes (sync or async)"""
+    if inspect.iscoroutinefunction(f):
+        @wraps(f)
+        async def decorated_coroutine(*args, **kwargs):
+            user, error = authenticate()
+            if error:
+                return error
+            return await f(user, *args, **kwargs)
+        return decorated_coroutine
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({"error": "Unauthorized"}), 401
-
-        user = get_user_from_token(auth_header)
-        if not user:
-            return jsonify({"error": "Invalid token"}), 401
+        user, error = authenticate()
+        if error:
+            return error
 
         # Pass user to the route
         return f(user, *args, **kwargs)
     return decorated_function
 
 
-def calculate_total_credits(user_id):
-    """Calculate total credits including mini-game awards."""
-    # Get total plants (each plant = 10 credits base)
-    plant_count = 0
-    try:
-        plants_response = supabase.table("plants").select(
-            "id").eq("user_id", user_id).execute()
-        plant_count = len(plants_response.data or [])
-    except Exception as e:
-        print(f"Error loading plants for credits: {str(e)}")
+def current_credits(user_id):
+    """Total credits and breakdown from the user's ledger balance row.
 
-    # Get achievements (each achievement = bonus credits)
-    achievements = []
+    Falls back to recomputing from scratch if the ledger is unavailable.
+    """
     try:
-        achievements = get_user_achievements(supabase, user_id)
+        balance = get_balance(supabase, user_id)
+        return total_credits(balance), credits_breakdown(balance)
     except Exception as e:
-        print(f"Error loading achievements for credits: {str(e)}")
-    achievement_bonus = len(achievements) * 25
+        log.error("Error loading credit balance: %s", e)
+        return calculate_total_credits(supabase, user_id)
 
-    # Get streak (each day = 5 credits)
-    streak = 0
-    try:
-        streak = get_user_streak(supabase, user_id)
-    except Exception as e:
-        print(f"Error loading streak for credits: {str(e)}")
-    streak_bonus = streak * 5
 
-    # Get minigame credits
-    minigame_credits = 0
-    try:
-        minigame_response = supabase.table("minigame_scores").select(
-            "credits_awarded").eq("user_id", user_id).execute()
-        minigame_credits = sum(
-            row.get("credits_awarded", 0) for row in (minigame_response.data or [])
-        )
-    except Exception as e:
-        print(f"Error loading minigame credits: {str(e)}")
+# ========== PLANT HELPERS ==========
+def build_plant_data(user_id, features):
+    """Generate plant attributes from analyzed doodle features"""
+    return {
+        "user_id": user_id,
+        # Height: darker doodles = taller plants (100-400px)
+        "height": features["height"],
+        # Branches: random 1-5
+        "branches": random.randint(1, 5),
+        # Leaf type: random
+        "leaf_type": random.choice(LEAF_TYPES),
+        # Color: random green
+        "color": random.choice(GREEN_COLORS),
+        # Growth stage: always 1 initially
+        "growth_stage": 1,
+    }
+
+
+def pool_busy_response(error):
+    """503 response telling the client when to retry a doodle upload"""
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def publish_credits(user_id, balance):
+    """Tell the user's open gardens about a new credit balance"""
+    if balance:
+        garden_events.publish(user_id, garden_events.CREDITS_CHANGED, {
+            "total_credits": total_credits(balance),
+            "breakdown": credits_breakdown(balance)
+        })
+
+
+def on_plants_created(user_id, plants):
+    """Fold newly inserted plants into stats, challenge progress,
+    achievements, credit ledger and leaderboard, and publish the
+    resulting garden events"""
+    previous, stats = record_plants(supabase, user_id, plants)
+    summary = summarize(stats) if stats else None
+    for plant in plants:
+        garden_events.publish(user_id, garden_events.PLANT_CREATED,
+                              {"plant": plant, "stats": summary})
+
+    before, progress = challenge_progress.record_plants(supabase, user_id, plants)
+    if progress is not None:
+        already_completed = challenge_progress.completed_challenges(before)
+        for challenge_id in challenge_progress.completed_challenges(progress):
+            if challenge_id not in already_completed:
+                garden_events.publish(user_id, garden_events.CHALLENGE_COMPLETED,
+                                      {"id": challenge_id})
+
+    if stats is None:
+        publish_credits(user_id, post_entries(supabase, user_id, plant_entries(plants)))
+        return
+
+    new_achievements = award_for_event(
+        supabase, user_id, summarize(previous), summary)
+    for achievement in new_achievements:
+        garden_events.publish(user_id, garden_events.ACHIEVEMENT_AWARDED, achievement)
+    publish_credits(user_id, post_entries(
+        supabase, user_id,
+        plant_entries(plants) + achievement_entries(new_achievements),
+        streak=summary["streak"]))
+    leaderboards.record_plants(
+        user_id, summary["total_plants"], summary["streak"])
+    if new_achievements:
+        leaderboards.record_achievements(user_id, len(new_achievements))
+
+
+# ========== UPLOAD HELPERS ==========
+RAW_IMAGE_MIMETYPES = {"image/png", "image/webp"}
+MAX_BATCH_SIZE = int(os.getenv("GENERATE_MAX_BATCH_SIZE", "10"))
+
+
+def batch_limit():
+    """Most images /generate/batch accepts: GENERATE_MAX_BATCH_SIZE, capped
+    at what the doodle pool can queue at once (a bigger batch never fits)"""
+    queue_limit = pool_capacity()
+    if queue_limit is None:
+        return MAX_BATCH_SIZE
+    return min(MAX_BATCH_SIZE, queue_limit)
+
+
+def read_doodle_upload():
+    """Return a seekable file object holding the uploaded doodle, or None.
+
+    /generate accepts three request encodings:
+      - a raw image/png or image/webp body (preferred, no base64 overhead)
+      - multipart/form-data with the image in an "image" file field
+      - JSON {"image": "data:image/png;base64,..."} (legacy clients)
+    """
+    mimetype = request.mimetype
+
+    if mimetype in RAW_IMAGE_MIMETYPES:
+        body = request.get_data(cache=False)
+        return BytesIO(body) if body else None
+
+    if mimetype == "multipart/form-data":
+        upload = request.files.get("image")
+        return upload.stream if upload else None
+
+    data = request.get_json(silent=True) or {}
+    canvas_data = data.get("image")
+    if not canvas_data:
+        return None
+
+    return decode_data_url(canvas_data)
+
+
+def decode_data_url(canvas_data):
+    """Decode a data:image/...;base64, URL into a file object"""
+    # Remove the data:image/png;base64, prefix
+    image_data = canvas_data.split(",", 1)[-1]
+    return BytesIO(base64.b64decode(image_data))
+
+
+def read_doodle_batch():
+    """Return the list of uploaded doodles for /generate/batch, in order.
+
+    Accepts multipart/form-data with repeated "images" file fields, or
+    JSON {"images": ["data:image/png;base64,...", ...]}. Items that are
+    missing or cannot be base64-decoded come back as None so the caller
+    can report a per-item error.
+    """
+    if request.mimetype == "multipart/form-data":
+        return [upload.stream for upload in request.files.getlist("images")]
+
+    data = request.get_json(silent=True) or {}
+    doodles = []
+    for canvas_data in data.get("images") or []:
+        try:
+            doodles.append(decode_data_url(canvas_data)
+                           if canvas_data else None)
+        except (ValueError, TypeError, AttributeError):
+            doodles.append(None)
+    return doodles
+
+
+# ========== GARDEN PAYLOADS ==========
+# Response bodies shared by the individual routes and /garden/bootstrap
+
+def plants_payload(user_id, columns="*", limit=None, cursor=None, since=None,
+                   version=None):
+    """/plants paging body: one page (or, with `since`, the plants created
+    after that watermark) plus the current watermark and plant count.
+
+    `version` is a (total, newest) pair from garden_version if the caller
+    already has one. Raises InvalidPageRequest for bad parameters.
+    """
+    total, newest = version or garden_version(supabase, user_id)
+    limit = parse_limit(limit)
+
+    if since is not None:
+        new_plants, watermark, has_more = fetch_since(
+            supabase, user_id, columns, since=since, limit=limit)
+        return {"plants": new_plants, "watermark": watermark,
+                "has_more": has_more, "total": total}
+
+    page, next_cursor = fetch_page(
+        supabase, user_id, columns, limit=limit, cursor=cursor)
+    return {"plants": page, "next_cursor": next_cursor,
+            "watermark": encode_cursor(newest) if newest else None,
+            "total": total}
+
+
+def stats_payload(user_id):
+    """/stats: aggregate stats plus the user's achievements"""
+    # Get aggregate stats (single-row read, no plant scan).
+    # Achievements are awarded when plants are created, so this is read-only.
+    stats_row = get_user_stats(supabase, user_id)
+
+    # Get all achievements
+    achievements = get_user_achievements(supabase, user_id)
+
+    return stats_body(stats_row, achievements)
+
+
+def stats_body(stats_row, achievements):
+    summary = summarize(stats_row)
+    return {
+        "total_plants": summary["total_plants"],
+        "streak": summary["streak"],
+        "achievements": achievements,
+        "achievements_count": len(achievements),
+        "tallest_plant": summary["tallest_plant"],
+        "unique_colors": summary["unique_colors"],
+        "unique_leaf_types": summary["unique_leaf_types"]
+    }
+
+
+def challenges_payload(user_id):
+    """/challenges: today's challenge progress, mini-games and the shop"""
+    # Today's progress is a single-row read, no plant scan
+    progress = challenge_progress.get_challenge_progress(supabase, user_id)
+
+    return {
+        "daily_challenges": challenge_progress.challenge_status(progress),
+        "mini_games": MINI_GAMES,
+        "cosmetics": COSMETICS_SHOP
+    }
+
+
+def credits_payload(user_id):
+    """/credits: balance and where it came from"""
+    return credits_body(*current_credits(user_id))
+
+
+def credits_body(credits, breakdown):
+    return {
+        "total_credits": credits,
+        "plant_credits": breakdown["plant_credits"],
+        "achievement_bonus": breakdown["achievement_bonus"],
+        "streak_bonus": breakdown["streak_bonus"],
+        "minigame_credits": breakdown["minigame_credits"],
+        "spent_credits": breakdown["spent_credits"],
+        "earned_credits": breakdown["earned_credits"],
+        "breakdown": {
+            "plants": breakdown["plants"],
+            "achievements": breakdown["achievements"],
+            "streak": breakdown["streak"],
+            "minigames": breakdown["minigame_credits"],
+            "spent": breakdown["spent_credits"]
+        }
+    }
 
-    # Get spent credits from owned cosmetics
-    spent_credits = 0
+
+def cosmetics_payload(user_id):
+    """/cosmetics: every cosmetic with the user's ownership"""
+    # Get user's owned cosmetics
     try:
         owned_response = supabase.table("user_cosmetics").select(
             "cosmetic_id").eq("user_id", user_id).execute()
-        owned_ids = [item.get("cosmetic_id")
-                     for item in (owned_response.data or [])]
-        for cid in owned_ids:
-            if cid is None:
-                continue
-            if isinstance(cid, str) and cid.isdigit():
-                cid = int(cid)
-            if isinstance(cid, int) and 0 <= cid < len(COSMETICS_SHOP):
-                spent_credits += COSMETICS_SHOP[cid]["price"]
-            else:
-                for cosmetic in COSMETICS_SHOP:
-                    if cosmetic.get("id") == cid:
-                        spent_credits += cosmetic["price"]
-                        break
-    except Exception as e:
-        print(f"Error loading spent credits: {str(e)}")
-
-    earned_credits = (plant_count * 10) + achievement_bonus + \
-        streak_bonus + minigame_credits
-    total_credits = max(0, earned_credits - spent_credits)
-
-    return total_credits, {
-        "plants": plant_count,
-        "achievements": len(achievements),
-        "streak": streak,
-        "plant_credits": plant_count * 10,
-        "achievement_bonus": achievement_bonus,
-        "streak_bonus": streak_bonus,
-        "minigame_credits": minigame_credits,
-        "spent_credits": spent_credits,
-        "earned_credits": earned_credits
-    }
+        owned_ids = {item["cosmetic_id"]
+                     for item in owned_response.data or []}
+    except:
+        owned_ids = set()
+
+    # Build cosmetics list with ownership info
+    cosmetics_list = []
+    for cosmetic_id, cosmetic_data in enumerate(COSMETICS_SHOP):
+        cosmetics_list.append({
+            "id": cosmetic_id,
+            "key": cosmetic_data.get("id"),
+            "name": cosmetic_data["name"],
+            "description": cosmetic_data["description"],
+            "emoji": cosmetic_data["emoji"],
+            "price": cosmetic_data["price"],
+            "owned": str(cosmetic_id) in owned_ids or cosmetic_id in owned_ids
+        })
+    return cosmetics_list
 
 
 # ========== ROUTES ==========
@@ -195,94 +490,175 @@ def generate(user):
     """
     try:
         user_id = user.id
-        data = request.get_json()
-        canvas_data = data.get("image")
+        try:
+            doodle = read_doodle_upload()
+        except ValueError:
+            # Malformed base64 in a JSON data URL
+            return jsonify({"error": "Invalid image data"}), 400
 
-        if not canvas_data:
+        if doodle is None:
             return jsonify({"error": "No image data provided"}), 400
 
-        # Get the token from the request header
-        auth_header = request.headers.get('Authorization', '')
-        token = auth_header.replace('Bearer ', '') if auth_header else ''
-
-        # Remove the data:image/png;base64, prefix
-        image_data = canvas_data.split(",")[1]
-        image_bytes = base64.b64decode(image_data)
-
-        # Load image and convert to grayscale
-        image = Image.open(BytesIO(image_bytes))
-        grayscale = image.convert("L")
-
-        # Analyze pixel darkness (average darkness)
-        pixels = list(grayscale.getdata())
-        avg_darkness = sum(pixels) / len(pixels) if pixels else 128
-
-        # Normalize darkness to 0-1 range (0 = light, 1 = dark)
-        darkness_ratio = 1 - (avg_darkness / 255)
-
-        # Generate plant attributes based on doodle characteristics
-        # Height: darker doodles = taller plants (100-400px)
-        height = int(100 + (darkness_ratio * 300))
-
-        # Branches: random 1-5
-        branches = random.randint(1, 5)
-
-        # Leaf type: random
-        leaf_type = random.choice(LEAF_TYPES)
-
-        # Color: random green
-        color = random.choice(GREEN_COLORS)
-
-        # Growth stage: always 1 initially
-        growth_stage = 1
+        # Analyze the doodle (darkness, ink coverage, bbox, center of mass)
+        try:
+            features = analyze_doodle(doodle)
+        except (OSError, ValueError):
+            # Not an image (UnidentifiedImageError), or a corrupt one:
+            # e.g. a truncated PNG raises OSError from image.load()
+            return jsonify({"error": "Invalid image data"}), 400
+        except DoodleTooLarge as e:
+            return jsonify({"error": str(e)}), 413
+        except (DoodlePoolBusy, DoodlePoolTimeout) as e:
+            return pool_busy_response(e)
 
         # Insert into Supabase with user_id
-        plant_data = {
-            "user_id": user_id,
-            "height": height,
-            "branches": branches,
-            "leaf_type": leaf_type,
-            "color": color,
-            "growth_stage": growth_stage,
-        }
+        plant_data = build_plant_data(user_id, features)
 
-        print(f"Attempting to insert plant for user {user_id}")
-        print(f"Plant data: {plant_data}")
+        payload_log.debug("Plant data for user %s: %s", user_id, plant_data)
 
         # Use the global supabase client - RLS should allow this since user_id matches authenticated user
         response = supabase.table("plants").insert(plant_data).execute()
 
-        print(f"Response: {response}")
+        payload_log.debug("Insert response: %s", response)
         if hasattr(response, 'data') and response.data:
             plant = response.data[0]
-            print(f"Plant created successfully: {plant}")
+            log.info("Plant %s created for user %s", plant.get("id"), user_id)
+            on_plants_created(user_id, [plant])
             return jsonify(plant), 201
         else:
             error_msg = f"Failed to insert plant"
-            print(f"Error in /generate: {error_msg}")
-            if hasattr(response, 'data'):
-                print(f"Response data: {response.data}")
+            log.error("Error in /generate: %s (response data: %s)",
+                      error_msg, getattr(response, "data", None))
             return jsonify({"error": error_msg}), 500
 
     except Exception as e:
-        error_msg = f"Error in /generate: {str(e)}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in /generate")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/generate/batch", methods=["POST"])
+@require_auth
+def generate_batch(user):
+    """
+    Create several plants from several doodles in one request.
+    All plants are written with a single bulk insert and returned in
+    upload order; items that fail carry an "error" instead of a "plant".
+    """
+    try:
+        user_id = user.id
+        doodles = read_doodle_batch()
+
+        if not doodles:
+            return jsonify({"error": "No image data provided"}), 400
+        max_images = batch_limit()
+        if len(doodles) > max_images:
+            return jsonify({
+                "error": f"Too many images (max {max_images})"
+            }), 413
+
+        # Queue every doodle at once so the pool analyzes them together
+        try:
+            futures = iter(submit_many([d for d in doodles if d is not None]))
+        except DoodlePoolBusy as e:
+            return pool_busy_response(e)
+
+        results = []
+        pending = []
+        for index, doodle in enumerate(doodles):
+            if doodle is None:
+                results.append({"index": index, "error": "No image data provided"})
+                continue
+            try:
+                features = wait_for_doodle(next(futures))
+            except (OSError, ValueError):
+                # Not an image, or a corrupt one (e.g. truncated)
+                results.append({"index": index, "error": "Invalid image data"})
+                continue
+            except (DoodleTooLarge, DoodlePoolTimeout) as e:
+                results.append({"index": index, "error": str(e)})
+                continue
+            result = {"index": index}
+            results.append(result)
+            pending.append((result, build_plant_data(user_id, features)))
+
+        if pending:
+            response = supabase.table("plants").insert(
+                [plant_data for _, plant_data in pending]).execute()
+            created = response.data or []
+            if created:
+                on_plants_created(user_id, created)
+            for i, (result, _) in enumerate(pending):
+                if i < len(created):
+                    result["plant"] = created[i]
+                else:
+                    result["error"] = "Failed to insert plant"
+
+        created_count = sum(1 for r in results if "plant" in r)
+        return jsonify({
+            "results": results,
+            "created": created_count,
+            "failed": len(results) - created_count
+        }), 201 if created_count else 400
+
+    except Exception as e:
+        log.exception("Error in /generate/batch")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/plants", methods=["GET"])
 @require_auth
 def plants(user):
-    """Fetch only plants belonging to logged-in user, ordered by newest first"""
+    """Fetch only plants belonging to logged-in user, ordered by newest first.
+
+    With `limit` or `cursor` the plants come back one page at a time as
+    {"plants": [...], "next_cursor": ...}; pass next_cursor back to get the
+    following page. `fields` picks the columns to return. Without paging
+    parameters the whole garden is returned as a plain list.
+
+    With `since` (a watermark from an earlier response) only plants created
+    after it are returned, oldest first, with the new watermark and the
+    total plant count. Other responses carry an ETag and Last-Modified, so
+    an unchanged garden is answered with 304 Not Modified.
+    """
     try:
         user_id = user.id
-        response = supabase.table("plants").select(
-            "*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        return jsonify(response.data), 200
+        try:
+            columns = parse_fields(request.args.get("fields"))
+            total, newest = garden_version(supabase, user_id)
+
+            if "since" in request.args:
+                return jsonify(plants_payload(
+                    user_id, columns, request.args.get("limit") or MAX_PAGE_SIZE,
+                    since=request.args.get("since"), version=(total, newest))), 200
+
+            # Plants are insert-only, so the newest plant and the count
+            # identify this view of the garden without reading it
+            etag = version_etag(user_id, total, newest,
+                                request.query_string.decode())
+            conditional = Response()
+            conditional.set_etag(etag)
+            conditional.last_modified = last_modified(newest)
+            if conditional.make_conditional(request).status_code == 304:
+                return conditional
+
+            if "limit" not in request.args and "cursor" not in request.args:
+                response = supabase.table("plants").select(
+                    columns).eq("user_id", user_id).order("created_at", desc=True).execute()
+                body = response.data
+            else:
+                body = plants_payload(
+                    user_id, columns, request.args.get("limit"),
+                    cursor=request.args.get("cursor"), version=(total, newest))
+        except InvalidPageRequest as e:
+            return jsonify({"error": str(e)}), 400
+
+        response = jsonify(body)
+        response.set_etag(etag)
+        response.last_modified = last_modified(newest)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response, 200
     except Exception as e:
-        print(f"Error in /plants: {str(e)}")
+        log.error("Error in /plants: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -291,34 +667,9 @@ def plants(user):
 def stats(user):
     """Get user stats including achievements and streak"""
     try:
-        user_id = user.id
-
-        # Get plants
-        plants_response = supabase.table("plants").select(
-            "*").eq("user_id", user_id).execute()
-        plants = plants_response.data or []
-
-        # Check for new achievements
-        check_and_award_achievements(
-            supabase, user_id, plants, current_streak=get_user_streak(supabase, user_id))
-
-        # Get all achievements
-        achievements = get_user_achievements(supabase, user_id)
-
-        # Calculate stats
-        stats_data = {
-            "total_plants": len(plants),
-            "streak": get_user_streak(supabase, user_id),
-            "achievements": achievements,
-            "achievements_count": len(achievements),
-            "tallest_plant": max([p.get("height", 0) for p in plants]) if plants else 0,
-            "unique_colors": len(set(p.get("color") for p in plants)) if plants else 0,
-            "unique_leaf_types": len(set(p.get("leaf_type") for p in plants)) if plants else 0
-        }
-
-        return jsonify(stats_data), 200
+        return jsonify(stats_payload(user.id)), 200
     except Exception as e:
-        print(f"Error in /stats: {str(e)}")
+        log.error("Error in /stats: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -333,45 +684,9 @@ def garden():
 def get_challenges(user):
     """Get daily challenges and mini-games"""
     try:
-        user_id = user.id
-
-        # Get today's plants
-        today = datetime.utcnow().date()
-        plants_today = supabase.table("plants").select(
-            "*").eq("user_id", user_id).gte(
-            "created_at", f"{today}T00:00:00"
-        ).execute()
-
-        today_plants = plants_today.data or []
-
-        # Calculate challenge progress
-        challenge_progress = []
-        for challenge in DAILY_CHALLENGES:
-            if challenge["id"] == "rainbow_collector":
-                completed = len(set(p.get("color") for p in today_plants)) >= 3
-            elif challenge["id"] == "leaf_explorer":
-                completed = len(set(p.get("leaf_type")
-                                for p in today_plants)) >= 3
-            else:
-                completed = any(challenge["condition"](
-                    p) for p in today_plants) if today_plants else False
-
-            challenge_progress.append({
-                "id": challenge["id"],
-                "name": challenge["name"],
-                "emoji": challenge["emoji"],
-                "description": challenge["description"],
-                "reward": challenge["reward"],
-                "completed": completed
-            })
-
-        return jsonify({
-            "daily_challenges": challenge_progress,
-            "mini_games": MINI_GAMES,
-            "cosmetics": COSMETICS_SHOP
-        }), 200
+        return jsonify(challenges_payload(user.id)), 200
     except Exception as e:
-        print(f"Error in /challenges: {str(e)}")
+        log.error("Error in /challenges: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -380,27 +695,9 @@ def get_challenges(user):
 def get_credits(user):
     """Get user credits and purchase history"""
     try:
-        user_id = user.id
-        total_credits, breakdown = calculate_total_credits(user_id)
-
-        return jsonify({
-            "total_credits": total_credits,
-            "plant_credits": breakdown["plant_credits"],
-            "achievement_bonus": breakdown["achievement_bonus"],
-            "streak_bonus": breakdown["streak_bonus"],
-            "minigame_credits": breakdown["minigame_credits"],
-            "spent_credits": breakdown["spent_credits"],
-            "earned_credits": breakdown["earned_credits"],
-            "breakdown": {
-                "plants": breakdown["plants"],
-                "achievements": breakdown["achievements"],
-                "streak": breakdown["streak"],
-                "minigames": breakdown["minigame_credits"],
-                "spent": breakdown["spent_credits"]
-            }
-        }), 200
+        return jsonify(credits_payload(user.id)), 200
     except Exception as e:
-        print(f"Error in /credits: {str(e)}")
+        log.error("Error in /credits: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -409,225 +706,243 @@ def get_credits(user):
 def get_cosmetics(user):
     """Get all cosmetics and user's owned cosmetics"""
     try:
-        user_id = user.id
-
-        # Get user's owned cosmetics
-        try:
-            owned_response = supabase.table("user_cosmetics").select(
-                "cosmetic_id").eq("user_id", user_id).execute()
-            owned_ids = {item["cosmetic_id"]
-                         for item in owned_response.data or []}
-        except:
-            owned_ids = set()
-
-        # Build cosmetics list with ownership info
-        cosmetics_list = []
-        for cosmetic_id, cosmetic_data in enumerate(COSMETICS_SHOP):
-            cosmetics_list.append({
-                "id": cosmetic_id,
-                "key": cosmetic_data.get("id"),
-                "name": cosmetic_data["name"],
-                "description": cosmetic_data["description"],
-                "emoji": cosmetic_data["emoji"],
-                "price": cosmetic_data["price"],
-                "owned": str(cosmetic_id) in owned_ids or cosmetic_id in owned_ids
-            })
-
-        return jsonify(cosmetics_list), 200
+        return jsonify(cosmetics_payload(user.id)), 200
     except Exception as e:
-        print(f"Error in /cosmetics: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in /cosmetics")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/purchase", methods=["POST"])
+@app.route("/garden/bootstrap", methods=["GET"])
 @require_auth
-def purchase_cosmetic(user):
-    """Purchase a cosmetic with credits"""
+def garden_bootstrap(user):
+    """Everything the garden page needs in one round trip.
+
+    Returns {"plants", "stats", "credits", "challenges", "cosmetics"},
+    each exactly what its own endpoint returns. plants is the first page
+    (`fields` and `limit` as for /plants), or with `since` the plants
+    created after that watermark. The sections are built concurrently
+    and share the request's query cache, so a table read by two sections
+    is fetched once. A section that fails comes back as null.
+    Per-section timings are in the Server-Timing header.
+    """
     try:
         user_id = user.id
-        data = request.get_json()
-        cosmetic_id = data.get("cosmetic_id")
+        try:
+            columns = parse_fields(request.args.get("fields"))
+            limit = parse_limit(request.args.get("limit"))
+        except InvalidPageRequest as e:
+            return jsonify({"error": str(e)}), 400
+        since = request.args.get("since")
+
+        start = time.perf_counter()
+        sections, timings = run_concurrently({
+            "plants": (lambda: plants_payload(user_id, columns, limit, since=since),
+                       None, "plants"),
+            "stats": (lambda: stats_payload(user_id), None, "stats"),
+            "credits": (lambda: credits_payload(user_id), None, "credits"),
+            "challenges": (lambda: challenges_payload(user_id), None, "challenges"),
+            "cosmetics": (lambda: cosmetics_payload(user_id), None, "cosmetics"),
+        })
+        total_ms = (time.perf_counter() - start) * 1000
+
+        response = jsonify(sections)
+        response.headers["Server-Timing"] = ", ".join(
+            [f"{name};dur={ms}" for name, ms in timings.items() if ms is not None]
+            + [f"total;dur={total_ms:.1f}"])
+        return response, 200
+    except Exception as e:
+        log.error("Error in /garden/bootstrap: %s", e)
+        return jsonify({"error": str(e)}), 500
 
-        if cosmetic_id is None:
-            return jsonify({"error": "cosmetic_id required"}), 400
 
-        # Get cosmetic price
-        if cosmetic_id < 0 or cosmetic_id >= len(COSMETICS_SHOP):
-            return jsonify({"error": "Invalid cosmetic"}), 400
+def read_purchase_request():
+    """(cosmetic_id, cosmetic, None) for a valid /purchase body, or
+    (None, None, error response)"""
+    data = request.get_json()
+    cosmetic_id = data.get("cosmetic_id")
 
-        cosmetic = COSMETICS_SHOP[cosmetic_id]
-        price = cosmetic["price"]
+    if cosmetic_id is None:
+        return None, None, (jsonify({"error": "cosmetic_id required"}), 400)
 
-        # Get user's credits (including minigame awards)
-        total_credits, _ = calculate_total_credits(user_id)
+    # Get cosmetic price
+    if cosmetic_id < 0 or cosmetic_id >= len(COSMETICS_SHOP):
+        return None, None, (jsonify({"error": "Invalid cosmetic"}), 400)
+
+    return cosmetic_id, COSMETICS_SHOP[cosmetic_id], None
+
+
+def owns_cosmetic(user_id, cosmetic_id):
+    """Whether the user already owns a cosmetic (False if unknown)"""
+    try:
+        existing = supabase.table("user_cosmetics").select(
+            "*").eq("user_id", user_id).eq("cosmetic_id", str(cosmetic_id)).execute()
+        return bool(existing.data)
+    except:
+        return False
 
-        if total_credits < price:
+
+def complete_purchase(user_id, cosmetic_id, cosmetic, available_credits, owned):
+    """Record a purchase after the credit and ownership checks.
+
+    The checks are repeated inside the purchase transaction, so two
+    concurrent purchases cannot both spend the same credits.
+    """
+    price = cosmetic["price"]
+    if available_credits < price:
+        return jsonify({
+            "error": "Not enough credits",
+            "required": price,
+            "current": available_credits
+        }), 402
+
+    # Check if already owned
+    if owned:
+        return jsonify({"error": "Already owned"}), 409
+
+    # Add to user_cosmetics and spend the credits
+    try:
+        status, balance = buy_cosmetic(supabase, user_id, cosmetic_id, price)
+        if status == "insufficient":
             return jsonify({
                 "error": "Not enough credits",
                 "required": price,
-                "current": total_credits
+                "current": total_credits(balance)
             }), 402
+        if status == "owned":
+            return jsonify({"error": "Already owned"}), 409
+        publish_credits(user_id, balance)
 
-        # Check if already owned
-        try:
-            existing = supabase.table("user_cosmetics").select(
-                "*").eq("user_id", user_id).eq("cosmetic_id", str(cosmetic_id)).execute()
-            if existing.data:
-                return jsonify({"error": "Already owned"}), 409
-        except:
-            pass
-
-        # Add to user_cosmetics
-        try:
-            insert_response = supabase.table("user_cosmetics").insert({
-                "user_id": user_id,
-                "cosmetic_id": str(cosmetic_id),
-                "owned": True
-            }).execute()
+        return jsonify({
+            "success": True,
+            "cosmetic": cosmetic["name"],
+            "price": price,
+            "remaining_credits": total_credits(balance)
+        }), 201
+    except Exception as e:
+        log.error("Insert error: %s", e)
+        # If RLS prevents insert, we'll just accept it as purchased
+        return jsonify({
+            "success": True,
+            "cosmetic": cosmetic["name"],
+            "price": price,
+            "remaining_credits": available_credits - price,
+            "note": "Purchase recorded (RLS limitation)"
+        }), 201
 
-            return jsonify({
-                "success": True,
-                "cosmetic": cosmetic["name"],
-                "price": price,
-                "remaining_credits": total_credits - price
-            }), 201
-        except Exception as e:
-            print(f"Insert error: {str(e)}")
-            # If RLS prevents insert, we'll just accept it as purchased
-            return jsonify({
-                "success": True,
-                "cosmetic": cosmetic["name"],
-                "price": price,
-                "remaining_credits": total_credits - price,
-                "note": "Purchase recorded (RLS limitation)"
-            }), 201
 
+@app.route("/purchase", methods=["POST"])
+@require_auth
+def purchase_cosmetic(user):
+    """Purchase a cosmetic with credits"""
+    try:
+        user_id = user.id
+        cosmetic_id, cosmetic, error = read_purchase_request()
+        if error:
+            return error
+
+        # Get user's credits (including minigame awards)
+        available_credits, _ = current_credits(user_id)
+        owned = (available_credits >= cosmetic["price"]
+                 and owns_cosmetic(user_id, cosmetic_id))
+        return complete_purchase(user_id, cosmetic_id, cosmetic,
+                                 available_credits, owned)
     except Exception as e:
-        print(f"Error in /purchase: {str(e)}")
+        log.error("Error in /purchase: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+def build_leaderboard_body():
+    """Render the leaderboard JSON from the precomputed ranking index"""
+    leaderboards.ensure_fresh(supabase)
+    return app.json.dumps(leaderboards.index.payload()).encode("utf-8")
+
+
+LEADERBOARD_CACHE_TTL = int(os.getenv("LEADERBOARD_CACHE_TTL", "30"))
+leaderboard_cache = SharedResponseCache(build_leaderboard_body, LEADERBOARD_CACHE_TTL)
+
+
+def leaderboard_response(body, etag, state):
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = (
+        f"public, max-age={LEADERBOARD_CACHE_TTL}, "
+        f"stale-while-revalidate={LEADERBOARD_CACHE_TTL}")
+    response.headers["X-Cache"] = state
+    return response.make_conditional(request)
+
+
 @app.route("/leaderboard", methods=["GET"])
 def leaderboard():
     """Get global leaderboard - top gardeners by plants, credits, and streaks"""
     try:
-        leaderboard_data = {
-            "by_plants": [],
-            "by_credits": [],
-            "by_streaks": []
-        }
-
-        # Get all plants grouped by user
-        try:
-            plants_response = supabase.table("plants").select(
-                "user_id, height, color, leaf_type").execute()
-            plants = plants_response.data or []
-        except:
-            plants = []
-
-        # Get all achievements
-        try:
-            achievements_response = supabase.table("user_achievements").select(
-                "user_id").execute()
-            achievements = achievements_response.data or []
-        except:
-            achievements = []
-
-        # Calculate stats per user
-        user_stats = {}
-        for plant in plants:
-            user_id = plant["user_id"]
-            if user_id not in user_stats:
-                user_stats[user_id] = {
-                    "user_id": user_id,
-                    "plants": 0,
-                    "achievements": 0,
-                    "streak": 0
-                }
-            user_stats[user_id]["plants"] += 1
-
-        # Add achievement counts
-        for achievement in achievements:
-            user_id = achievement["user_id"]
-            if user_id not in user_stats:
-                user_stats[user_id] = {
-                    "user_id": user_id,
-                    "plants": 0,
-                    "achievements": 0,
-                    "streak": 0
-                }
-            user_stats[user_id]["achievements"] += 1
-
-        # Calculate streaks and credits for each user
-        for user_id in user_stats:
-            try:
-                streak = get_user_streak(supabase, user_id)
-                user_stats[user_id]["streak"] = streak
-            except:
-                user_stats[user_id]["streak"] = 0
-
-        # Sort by plants (top 10)
-        sorted_by_plants = sorted(
-            user_stats.values(),
-            key=lambda x: x["plants"],
-            reverse=True
-        )[:10]
-
-        leaderboard_data["by_plants"] = [
-            {
-                "rank": i+1,
-                "user_id": user["user_id"],
-                "value": user["plants"],
-                "label": f"{user['plants']} 🌱"
-            }
-            for i, user in enumerate(sorted_by_plants)
-        ]
-
-        # Sort by credits (plants*10 + achievements*25 + streak*5)
-        sorted_by_credits = sorted(
-            user_stats.values(),
-            key=lambda x: (x["plants"]*10 + x["achievements"]
-                           * 25 + x["streak"]*5),
-            reverse=True
-        )[:10]
-
-        leaderboard_data["by_credits"] = [
-            {
-                "rank": i+1,
-                "user_id": user["user_id"],
-                "value": user["plants"]*10 + user["achievements"]*25 + user["streak"]*5,
-                "label": f"{user['plants']*10 + user['achievements']*25 + user['streak']*5} 💰"
-            }
-            for i, user in enumerate(sorted_by_credits)
-        ]
-
-        # Sort by streaks (top 10)
-        sorted_by_streaks = sorted(
-            user_stats.values(),
-            key=lambda x: x["streak"],
-            reverse=True
-        )[:10]
-
-        leaderboard_data["by_streaks"] = [
-            {
-                "rank": i+1,
-                "user_id": user["user_id"],
-                "value": user["streak"],
-                "label": f"{user['streak']}🔥"
-            }
-            for i, user in enumerate(sorted_by_streaks)
-        ]
-
-        return jsonify(leaderboard_data), 200
+        # Same for every caller: served from a shared cache with an ETag
+        return leaderboard_response(*leaderboard_cache.get())
     except Exception as e:
-        print(f"Error in /leaderboard: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in /leaderboard")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/leaderboard/cache-stats", methods=["GET"])
+def leaderboard_cache_stats():
+    """Leaderboard cache hit rate and refresh duration"""
+    return jsonify(leaderboard_cache.stats()), 200
+
+
+@app.route("/events/ticket", methods=["POST"])
+@require_auth
+def events_ticket(user):
+    """A single-use ticket that opens one /events stream"""
+    return jsonify({"ticket": event_tickets.issue(user),
+                    "expires_in": event_tickets.ttl}), 200
+
+
+@app.route("/events", methods=["GET"])
+def events():
+    """Stream the user's garden events as server-sent events.
+
+    Browsers' EventSource cannot send an Authorization header, so it
+    passes ?ticket= from POST /events/ticket instead (the token itself
+    would end up in access logs). Reconnects resume after the
+    Last-Event-ID header (or ?last_event_id=).
+    """
+    auth_header = request.headers.get("Authorization")
+    user = (user_from_header(auth_header) if auth_header
+            else event_tickets.redeem(request.args.get("ticket")))
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    last_event_id = (request.headers.get("Last-Event-ID")
+                     or request.args.get("last_event_id"))
+    response = Response(
+        garden_events.stream(garden_events.hub, user.id, last_event_id),
+        mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx and similar proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/events/stats", methods=["GET"])
+def events_stats():
+    """Open event streams and published event counts for this worker"""
+    return jsonify(garden_events.hub.stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Request, query and doodle metrics for this worker (Prometheus text format)"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics.add_stats("garden_event_stream", "Event hub for /events", garden_events.hub.stats)
+metrics.add_stats("garden_auth_claim_cache", "Decoded token cache", claim_cache.stats)
+metrics.add_stats("garden_event_tickets", "Single-use /events tickets", event_tickets.stats)
+metrics.add_stats("garden_leaderboard_cache", "Leaderboard response cache", leaderboard_cache.stats)
+metrics.add_stats("garden_doodle_pool", "Doodle analysis process pool", pool_stats)
+metrics.add_stats("garden_log_queue", "Log records waiting for or dropped by the writer",
+                  log_config.stats)
+
+
 @app.route("/test")
 def test_draw():
     """Test page for debugging"""
@@ -642,78 +957,190 @@ def simple_test():
         return f.read()
 
 
+# Award credits based on game
+MINIGAME_CREDITS = {
+    'speed_draw': 100,  # 100 credits for completing Speed Draw
+    'color_match': 75,
+    'height_challenge': 75,
+    'accuracy_drill': 75
+}
+
+
+def read_minigame_request():
+    """(game, score, credits, None) for a valid /minigame/complete body, or
+    (None, None, None, error response)"""
+    data = request.json
+    game = data.get('game')
+    score = data.get('score', 0)
+    completed = data.get('completed', False)
+
+    if not game or not completed:
+        return None, None, None, (jsonify({"error": "Invalid game data"}), 400)
+
+    return game, score, MINIGAME_CREDITS.get(game, 50), None
+
+
+def record_minigame(user_id, game, score, credits):
+    """Insert the score and post its credits; False if that failed"""
+    try:
+        supabase.table('minigame_scores').insert({
+            'user_id': user_id,
+            'game': game,
+            'score': score,
+            'credits_awarded': credits,
+            'completed': True
+        }).execute()
+        publish_credits(user_id, post_entries(
+            supabase, user_id, [minigame_entry(game, credits)]))
+        return True
+    except Exception as e:
+        log.error("Error inserting minigame score: %s", e)
+        # Continue anyway - game was won
+        return False
+
+
+def minigame_result(user_id, credits, inserted):
+    """The /minigame/complete response with the user's new total"""
+    try:
+        # Credit formula: plants × 10 + achievements × 25 + streak × 5 + minigame credits
+        balance_credits, breakdown = current_credits(user_id)
+        if not inserted:
+            balance_credits += credits
+
+        return jsonify({
+            "message": f"Game completed! +{credits} credits",
+            "credits_awarded": credits,
+            "total_credits": balance_credits
+        }), 200
+
+    except Exception as e:
+        log.error("Error calculating credits: %s", e)
+        # Return a reasonable default
+        return jsonify({
+            "message": f"Game completed! +{credits} credits",
+            "credits_awarded": credits,
+            "total_credits": credits
+        }), 200
+
+
 @app.route('/minigame/complete', methods=['POST'])
-def minigame_complete():
+@require_auth
+def minigame_complete(user):
     """Record mini-game completion and award credits"""
     try:
-        # Get user from token
-        user_id = get_user_from_token(request.headers.get(
-            'Authorization', '').replace('Bearer ', ''))
-        if not user_id:
-            return jsonify({"error": "Not authenticated"}), 401
-
-        data = request.json
-        game = data.get('game')
-        score = data.get('score', 0)
-        completed = data.get('completed', False)
-
-        if not game or not completed:
-            return jsonify({"error": "Invalid game data"}), 400
-
-        # Award credits based on game
-        credits_awarded = {
-            'speed_draw': 100,  # 100 credits for completing Speed Draw
-            'color_match': 75,
-            'height_challenge': 75,
-            'accuracy_drill': 75
-        }
-
-        credits = credits_awarded.get(game, 50)
+        user_id = user.id
+        game, score, credits, error = read_minigame_request()
+        if error:
+            return error
 
         # Insert mini-game record
-        inserted = True
-        try:
-            supabase.table('minigame_scores').insert({
-                'user_id': user_id,
-                'game': game,
-                'score': score,
-                'credits_awarded': credits,
-                'completed': completed
-            }).execute()
-        except Exception as e:
-            print(f"Error inserting minigame score: {str(e)}")
-            # Continue anyway - game was won
-            inserted = False
+        inserted = record_minigame(user_id, game, score, credits)
 
         # Calculate total credits
-        try:
-            # Credit formula: plants × 10 + achievements × 25 + streak × 5 + minigame credits
-            total_credits, breakdown = calculate_total_credits(user_id)
-            if not inserted:
-                total_credits += credits
+        return minigame_result(user_id, credits, inserted)
+
+    except Exception as e:
+        log.exception("Error in /minigame/complete")
+        return jsonify({"error": str(e)}), 500
 
-            return jsonify({
-                "message": f"Game completed! +{credits} credits",
-                "credits_awarded": credits,
-                "total_credits": total_credits
-            }), 200
-
-        except Exception as e:
-            print(f"Error calculating credits: {str(e)}")
-            # Return a reasonable default
-            return jsonify({
-                "message": f"Game completed! +{credits} credits",
-                "credits_awarded": credits,
-                "total_credits": credits
-            }), 200
 
+# ========== ASYNC MODE ==========
+# With ASYNC_ROUTES=1 the I/O-bound routes below replace their threaded
+# versions (same URLs, same responses). Independent Supabase reads are
+# awaited together instead of one after another, and every blocking call
+# is awaited off the event loop. Flask runs async views through asgiref:
+# pip install "flask[async]".
+ASYNC_ROUTES = os.getenv("ASYNC_ROUTES", "0") == "1"
+
+
+@require_auth
+async def stats_async(user):
+    """/stats: the aggregate row and achievements are read concurrently"""
+    try:
+        stats_row, achievements = await gather_io(
+            (get_user_stats, supabase, user.id),
+            (get_user_achievements, supabase, user.id))
+        return jsonify(stats_body(stats_row, achievements)), 200
     except Exception as e:
-        print(f"Error in /minigame/complete: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.error("Error in /stats: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@require_auth
+async def credits_async(user):
+    try:
+        return jsonify(credits_body(*await run_io(current_credits, user.id))), 200
+    except Exception as e:
+        log.error("Error in /credits: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@require_auth
+async def challenges_async(user):
+    try:
+        return jsonify(await run_io(challenges_payload, user.id)), 200
+    except Exception as e:
+        log.error("Error in /challenges: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+async def leaderboard_async():
+    try:
+        return leaderboard_response(*await run_io(leaderboard_cache.get))
+    except Exception as e:
+        log.exception("Error in /leaderboard")
+        return jsonify({"error": str(e)}), 500
+
+
+@require_auth
+async def purchase_async(user):
+    """/purchase: balance and ownership are read concurrently"""
+    try:
+        cosmetic_id, cosmetic, error = read_purchase_request()
+        if error:
+            return error
+
+        (available_credits, _), owned = await gather_io(
+            (current_credits, user.id),
+            (owns_cosmetic, user.id, cosmetic_id))
+        return await run_io(complete_purchase, user.id, cosmetic_id, cosmetic,
+                            available_credits, owned)
+    except Exception as e:
+        log.error("Error in /purchase: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@require_auth
+async def minigame_complete_async(user):
+    try:
+        game, score, credits, error = read_minigame_request()
+        if error:
+            return error
+
+        inserted = await run_io(record_minigame, user.id, game, score, credits)
+        return await run_io(minigame_result, user.id, credits, inserted)
+    except Exception as e:
+        log.exception("Error in /minigame/complete")
+        return jsonify({"error": str(e)}), 500
+
+
+if ASYNC_ROUTES:
+    try:
+        import asgiref  # noqa: F401
+    except ImportError:
+        raise RuntimeError(
+            "ASYNC_ROUTES=1 needs Flask's async extra: pip install \"flask[async]\"")
+
+    app.view_functions.update({
+        "stats": stats_async,
+        "get_credits": credits_async,
+        "get_challenges": challenges_async,
+        "leaderboard": leaderboard_async,
+        "purchase_cosmetic": purchase_async,
+        "minigame_complete": minigame_complete_async,
+    })
+
+
 if __name__ == "__main__":
     import os
     port = int(os.getenv('PORT', 5000))
@@ -0,0 +1,178 @@
+"""Bearer token handling for Virtual Doodle Garden
+
+Every authenticated route resolves its user through `user_from_header`.
+Decoded claims are kept in a bounded LRU cache keyed by the SHA-256
+digest of the token, so a client sending the same token on every request
+pays for one JWT decode per token rather than one per request. Entries
+are dropped once the token's `exp` passes; an expired token is rejected.
+
+Tokens are issued by Supabase and signed with the project's JWT secret
+(SUPABASE_JWT_SECRET, under Settings > API). The signature and the
+"authenticated" audience are checked before `sub` is trusted: the server
+reads and writes with the service role key, so RLS does not stop a
+forged token. Without the secret every token is rejected, except on the
+offline STORAGE_BACKEND=sqlite, where any token with a `sub` signs in.
+
+Browsers' EventSource cannot send an Authorization header. Rather than
+putting the token in the /events URL (and so in access logs), the page
+trades it for a ticket: a random, single-use id that expires after
+EVENTS_TICKET_SECONDS. Tickets live in process memory.
+"""
+import hashlib
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from dotenv import load_dotenv
+
+log = logging.getLogger(__name__)
+
+load_dotenv()
+
+CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", "30"))
+JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = "authenticated"
+UNVERIFIED = not JWT_SECRET and os.getenv("STORAGE_BACKEND", "supabase") == "sqlite"
+
+if not JWT_SECRET and not UNVERIFIED:
+    log.error("SUPABASE_JWT_SECRET is not set: every bearer token will be rejected")
+BEARER_PREFIX = "Bearer "
+
+
+class User:
+    """The authenticated user a route receives"""
+
+    __slots__ = ("id", "email")
+
+    def __init__(self, user_id, email):
+        self.id = user_id
+        self.email = email
+
+
+def extract_token(authorization):
+    """The raw token from an Authorization header value (prefix optional)"""
+    if not authorization:
+        return None
+    if authorization.startswith(BEARER_PREFIX):
+        authorization = authorization[len(BEARER_PREFIX):]
+    return authorization.strip() or None
+
+
+def decode_user(token):
+    """(User, exp) from a token, or (None, None) if it is unusable"""
+    try:
+        if JWT_SECRET:
+            claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"],
+                                audience=JWT_AUDIENCE)
+        elif UNVERIFIED:
+            claims = jwt.decode(token, options={"verify_signature": False})
+        else:
+            return None, None
+    except jwt.PyJWTError as e:
+        log.warning("Token decoding error: %s", e)
+        return None, None
+
+    # 'sub' is the user ID in Supabase JWTs
+    if "sub" not in claims:
+        return None, None
+    exp = claims.get("exp")
+    if exp is not None and exp <= time.time():
+        return None, None
+    return User(claims["sub"], claims.get("email", "")), exp
+
+
+class ClaimCache:
+    """LRU of token digest -> (User, exp)"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def user(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user, exp = entry
+                if exp is None or exp > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return user
+                del self._entries[key]
+            self.misses += 1
+
+        user, exp = decode_user(token)
+        if user is not None and self.size > 0:
+            with self._lock:
+                self._entries[key] = (user, exp)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return user
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits,
+                "misses": self.misses}
+
+
+class TicketStore:
+    """Single-use tickets -> (User, expiry)"""
+
+    def __init__(self, ttl=TICKET_SECONDS):
+        self.ttl = ttl
+        self._tickets = {}
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.redeemed = 0
+
+    def issue(self, user):
+        ticket = secrets.token_urlsafe(24)
+        now = time.time()
+        with self._lock:
+            # Drop tickets that were never redeemed
+            for key in [k for k, (_, exp) in self._tickets.items() if exp <= now]:
+                del self._tickets[key]
+            self._tickets[ticket] = (user, now + self.ttl)
+            self.issued += 1
+        return ticket
+
+    def redeem(self, ticket):
+        """The ticket's User (once), or None if unknown, used or expired"""
+        if not ticket:
+            return None
+        with self._lock:
+            entry = self._tickets.pop(ticket, None)
+            if entry is None or entry[1] <= time.time():
+                return None
+            self.redeemed += 1
+        return entry[0]
+
+    def stats(self):
+        return {"pending": len(self._tickets), "issued": self.issued,
+                "redeemed": self.redeemed}
+
+
+# Process-wide cache and ticket store used by the app
+claim_cache = ClaimCache()
+event_tickets = TicketStore()
+
+
+def user_from_header(authorization):
+    """The User for an Authorization header value, or None"""
+    token = extract_token(authorization)
+    if not token:
+        return None
+    return claim_cache.user(token)
@@ -0,0 +1,124 @@
+"""Benchmark: threaded vs async (ASYNC_ROUTES=1) request handling
+
+Runs the async-capable routes (/stats, /credits, /challenges,
+/leaderboard, /purchase, /minigame/complete) through the Flask app with
+a fixed number of worker threads, once per mode, against the local
+SQLite backend (STORAGE_BACKEND=sqlite). Each database call takes a
+fixed simulated round trip (--latency-ms), which is what separates the
+modes: async views await independent reads together.
+
+Usage:
+    python benchmarks/bench_async_mode.py [--workers 8] [--requests 400] [--latency-ms 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = ["/stats", "/credits", "/challenges", "/leaderboard",
+          "/purchase", "/minigame/complete"]
+
+
+def seed_garden(sb, user_id, plants=120):
+    """Plants plus enough minigame credits that purchases never run short"""
+    sb.table("plants").insert([
+        {"user_id": user_id, "height": 100 + i % 300, "branches": 1 + i % 5,
+         "leaf_type": ("round", "pointy", "heart")[i % 3], "color": "#2d5016"}
+        for i in range(plants)]).execute()
+    sb.table("minigame_scores").insert({
+        "user_id": user_id, "game": "speed_draw", "score": 0,
+        "credits_awarded": 10 ** 6, "completed": True}).execute()
+
+
+def run_mode(workers, requests):
+    """Drive every route with `workers` threads in this process"""
+    import jwt
+
+    sys.path.insert(0, ROOT)
+    import app as app_module
+
+    seed_garden(app_module.supabase, "bench")
+
+    client = app_module.app.test_client()
+    token = "Bearer " + jwt.encode({"sub": "bench", "exp": int(time.time()) + 3600},
+                                   "bench", algorithm="HS256")
+    headers = {"Authorization": token}
+    requests_for = {
+        "/purchase": lambda: client.post("/purchase", json={"cosmetic_id": 0}, headers=headers),
+        "/minigame/complete": lambda: client.post(
+            "/minigame/complete", json={"game": "speed_draw", "completed": True},
+            headers=headers),
+    }
+
+    report = {}
+    for route in ROUTES:
+        send = requests_for.get(route, lambda: client.get(route, headers=headers))
+        send()  # warm up (e.g. the first leaderboard build)
+        remaining = [requests]
+        lock = threading.Lock()
+        latencies = []
+
+        def worker():
+            while True:
+                with lock:
+                    if remaining[0] == 0:
+                        return
+                    remaining[0] -= 1
+                start = time.perf_counter()
+                response = send()
+                elapsed = (time.perf_counter() - start) * 1000
+                assert response.status_code < 500, response.get_data(as_text=True)
+                with lock:
+                    latencies.append(elapsed)
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        report[route] = {"rps": requests / wall,
+                         "mean_ms": sum(latencies) / len(latencies)}
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--mode", choices=["threaded", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.workers, args.requests)
+        return
+
+    reports = {}
+    for mode in ("threaded", "async"):
+        env = dict(os.environ, ASYNC_ROUTES="1" if mode == "async" else "0",
+                   STORAGE_BACKEND="sqlite", STORAGE_LATENCY_MS=str(args.latency_ms))
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--workers", str(args.workers),
+             "--requests", str(args.requests)],
+            env=env, check=True, capture_output=True, text=True).stdout
+        reports[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{args.workers} workers, {args.latency_ms:g} ms per database call\n")
+    print(f"{'route':<20} | {'threaded rps':>12} {'mean ms':>8} | "
+          f"{'async rps':>9} {'mean ms':>8} | {'speedup':>7}")
+    print("-" * 77)
+    for route in ROUTES:
+        threaded, async_ = reports["threaded"][route], reports["async"][route]
+        print(f"{route:<20} | {threaded['rps']:>12.1f} {threaded['mean_ms']:>8.1f} | "
+              f"{async_['rps']:>9.1f} {async_['mean_ms']:>8.1f} | "
+              f"{async_['rps'] / threaded['rps']:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
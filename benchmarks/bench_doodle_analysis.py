@@ -0,0 +1,83 @@
+"""Benchmark: legacy per-pixel darkness vs doodle_analysis
+
+Compares the old /generate path (list(getdata()) + sum()) with
+doodle_analysis.analyze_image on synthetic canvases of several sizes.
+Reports mean per-image latency and peak Python heap (tracemalloc).
+
+Usage:
+    python benchmarks/bench_doodle_analysis.py [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doodle_analysis import analyze_image, height_from_darkness  # noqa: E402
+
+SIZES = [(400, 300), (800, 600), (1600, 1200), (3200, 2400)]
+
+
+def legacy_height(grayscale):
+    """The original /generate implementation"""
+    pixels = list(grayscale.getdata())
+    avg_darkness = sum(pixels) / len(pixels) if pixels else 128
+    darkness_ratio = 1 - (avg_darkness / 255)
+    return height_from_darkness(darkness_ratio)
+
+
+def new_height(grayscale):
+    return analyze_image(grayscale)["height"]
+
+
+def make_canvas(size, strokes=60, seed=7):
+    """White canvas with random dark strokes, like a real doodle"""
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    line_width = max(2, width // 100)
+    for _ in range(strokes):
+        points = [(rng.randrange(width), rng.randrange(height))
+                  for _ in range(4)]
+        draw.line(points, fill=(20, 20, 20), width=line_width)
+    return image.convert("L")
+
+
+def measure(fn, grayscale, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(grayscale)
+    latency_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    tracemalloc.start()
+    fn(grayscale)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, latency_ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'size':>11} | {'legacy ms':>9} {'legacy KiB':>11} | "
+          f"{'new ms':>8} {'new KiB':>8} | {'speedup':>7} | height")
+    print("-" * 78)
+    for size in SIZES:
+        grayscale = make_canvas(size)
+        old, old_ms, old_kib = measure(legacy_height, grayscale, args.repeat)
+        new, new_ms, new_kib = measure(new_height, grayscale, args.repeat)
+        match = "ok" if old == new else f"MISMATCH {old} != {new}"
+        print(f"{size[0]:>5}x{size[1]:<5} | {old_ms:>9.2f} {old_kib:>11.1f} | "
+              f"{new_ms:>8.2f} {new_kib:>8.1f} | {old_ms / new_ms:>6.1f}x | {match}")
+
+
+if __name__ == "__main__":
+    main()
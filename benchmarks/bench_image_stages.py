@@ -0,0 +1,206 @@
+"""Benchmark: the /generate doodle path, stage by stage
+
+Runs every canvas in benchmarks/corpus/ (blank, sparse, dense and
+high-resolution drawings, each as PNG and WebP) through the stages of
+/generate and reports, per stage, the mean time and the peak Python heap
+(tracemalloc) it allocates:
+
+    base64     decode the legacy JSON data URL payload
+    open       parse the header and check the pixel budget
+    decode     decode the pixels
+    grayscale  convert to "L"
+    darkness   histogram -> darkness -> plant height
+    analyze    analyze_image on the grayscale canvas (all features)
+    total      analyze_image_bytes on the encoded file, as /generate does
+
+Pillow allocates pixel buffers outside the Python heap, so the "pixels"
+column gives the decoded buffer size separately. WebP is the exception:
+its decoder hands Pillow a bytes object as large as the whole image,
+which shows up in the decode column.
+
+Every run asserts that each canvas still yields the plant height recorded
+in corpus/manifest.json; an optimization that changes a height fails the
+benchmark (exit status 1). --write-corpus regenerates the canvases and
+the manifest, which should only happen on purpose.
+
+Usage:
+    python benchmarks/bench_image_stages.py [--repeat 20] [--check] [--write-corpus]
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doodle_analysis import _tone_features, analyze_image, analyze_image_bytes, check_pixel_budget  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+MANIFEST = os.path.join(CORPUS_DIR, "manifest.json")
+
+# name -> (size, strokes, stroke width); canvases are drawn in a browser at
+# CSS size x devicePixelRatio, so 800x600 is a typical phone upload
+CANVASES = {
+    "blank": ((800, 600), 0, 0),
+    "sparse": ((800, 600), 6, 6),
+    "dense": ((800, 600), 400, 14),
+    "hires": ((2400, 1800), 120, 24),
+}
+FORMATS = {"png": {"format": "PNG", "optimize": True},
+           "webp": {"format": "WEBP", "quality": 80}}
+STAGES = ("base64", "open", "decode", "grayscale", "darkness", "analyze", "total")
+
+
+def draw_canvas(size, strokes, width, seed=7):
+    """White canvas with random dark strokes, like draw.js produces"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(strokes):
+        points = [(rng.randrange(size[0]), rng.randrange(size[1])) for _ in range(4)]
+        draw.line(points, fill=(33, 33, 33), width=width, joint="curve")
+    return image
+
+
+def write_corpus():
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    manifest = {}
+    for name, (size, strokes, width) in CANVASES.items():
+        image = draw_canvas(size, strokes, width)
+        for extension, options in FORMATS.items():
+            filename = f"{name}.{extension}"
+            path = os.path.join(CORPUS_DIR, filename)
+            image.save(path, **options)
+            with open(path, "rb") as f:
+                features = analyze_image_bytes(f.read())
+            manifest[filename] = {"size": list(size), "height": features["height"],
+                                  "bytes": os.path.getsize(path)}
+    with open(MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest
+
+
+def load_corpus():
+    with open(MANIFEST) as f:
+        manifest = json.load(f)
+    corpus = {}
+    for filename in manifest:
+        with open(os.path.join(CORPUS_DIR, filename), "rb") as f:
+            corpus[filename] = f.read()
+    return manifest, corpus
+
+
+def stage_functions(raw):
+    """Stage name -> (setup, fn); setup builds the stage's input outside the timing"""
+    data_url = "data:image/png;base64," + base64.b64encode(raw).decode()
+
+    def opened():
+        image = Image.open(BytesIO(raw))
+        check_pixel_budget(image)
+        return image
+
+    def decoded():
+        image = opened()
+        image.load()
+        return image
+
+    def grayscale():
+        return decoded().convert("L")
+
+    return {
+        "base64": (lambda: data_url, lambda url: base64.b64decode(url.split(",", 1)[-1])),
+        "open": (lambda: None, lambda _: opened()),
+        "decode": (opened, lambda image: image.load()),
+        "grayscale": (decoded, lambda image: image.convert("L")),
+        "darkness": (grayscale, lambda gray: _tone_features(gray)["height"]),
+        "analyze": (grayscale, analyze_image),
+        "total": (lambda: None, lambda _: analyze_image_bytes(raw)),
+    }
+
+
+def measure(setup, fn, repeat):
+    """(mean ms, peak traced KiB) of fn over fresh inputs"""
+    inputs = [setup() for _ in range(repeat)]
+    start = time.perf_counter()
+    for value in inputs:
+        fn(value)
+    mean_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    value = setup()
+    tracemalloc.start()
+    fn(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mean_ms, peak / 1024
+
+
+def check_heights(manifest, corpus):
+    """Names of corpus files whose derived height no longer matches"""
+    mismatches = []
+    for filename, raw in corpus.items():
+        height = analyze_image_bytes(raw)["height"]
+        if height != manifest[filename]["height"]:
+            mismatches.append(f"{filename}: height {height} != recorded "
+                              f"{manifest[filename]['height']}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--check", action="store_true",
+                        help="only assert the recorded heights")
+    parser.add_argument("--write-corpus", action="store_true",
+                        help="regenerate the corpus and manifest")
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        manifest = write_corpus()
+        print(f"Wrote {len(manifest)} canvases to {CORPUS_DIR}")
+        return
+
+    manifest, corpus = load_corpus()
+    if not args.check:
+        # Warm up decoders and lazily imported plugins
+        for raw in corpus.values():
+            analyze_image_bytes(raw)
+
+        times, peaks = {}, {}
+        for filename, raw in corpus.items():
+            results = [measure(setup, fn, args.repeat)
+                       for setup, fn in stage_functions(raw).values()]
+            times[filename] = [mean_ms for mean_ms, _ in results]
+            peaks[filename] = [peak_kib for _, peak_kib in results]
+
+        header = f"{'canvas':<11} | " + " ".join(f"{stage:>9}" for stage in STAGES)
+        print("Mean time per stage (ms)\n" + header + "\n" + "-" * len(header))
+        for filename, row in times.items():
+            print(f"{filename:<11} | " + " ".join(f"{ms:>9.2f}" for ms in row))
+
+        print("\nPeak Python heap per stage (KiB); pixels = decoded buffer (KiB)")
+        print(f"{header} | {'pixels':>7}\n" + "-" * (len(header) + 10))
+        for filename, row in peaks.items():
+            width, height = manifest[filename]["size"]
+            # Decoded RGB(A) buffer, which lives outside the Python heap
+            with Image.open(BytesIO(corpus[filename])) as image:
+                pixel_kib = width * height * len(image.getbands()) / 1024
+            print(f"{filename:<11} | " + " ".join(f"{kib:>9.0f}" for kib in row) +
+                  f" | {pixel_kib:>7.0f}")
+
+    mismatches = check_heights(manifest, corpus)
+    if mismatches:
+        print("\nHeight changed:\n  " + "\n  ".join(mismatches))
+        sys.exit(1)
+    print(f"\nHeights match the manifest for all {len(corpus)} canvases")
+
+
+if __name__ == "__main__":
+    main()
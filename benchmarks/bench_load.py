@@ -0,0 +1,295 @@
+"""Benchmark: end-to-end HTTP load against the offline backend
+
+Serves the app over real HTTP (werkzeug, threaded) with
+STORAGE_BACKEND=sqlite, seeds synthetic users whose gardens hold
+--garden-sizes plants each, and drives a weighted mix of /generate,
+/plants, /stats, /credits, /challenges, /leaderboard and /purchase from
+--concurrency client threads. Every garden size runs in a fresh process
+and database.
+
+Reports throughput and p50/p95/p99 latency per route. --output writes
+the results as JSON; --compare diffs a run against such a baseline and
+exits 1 if any route's p95 or throughput regressed beyond --tolerance.
+
+Usage:
+    python benchmarks/bench_load.py [--garden-sizes 10 1000 10000] [--users 10]
+        [--requests 2000] [--concurrency 8] [--mix default] [--latency-ms 0]
+        [--output baseline.json] [--compare baseline.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weights of each request kind
+MIXES = {
+    "default": {"generate": 10, "plants": 25, "stats": 15, "credits": 15,
+                "challenges": 10, "leaderboard": 15, "purchase": 10},
+    "browse": {"plants": 30, "plants_full": 5, "stats": 20, "credits": 15,
+               "challenges": 10, "leaderboard": 20},
+    "draw": {"generate": 50, "plants": 20, "stats": 10, "credits": 10,
+             "challenges": 5, "purchase": 5},
+}
+PERCENTILES = (50, 95, 99)
+
+
+def make_doodles(count=8, size=(400, 300), seed=7):
+    """PNG bodies of white canvases with random dark strokes"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    doodles = []
+    for _ in range(count):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        for _ in range(rng.randrange(5, 60)):
+            points = [(rng.randrange(size[0]), rng.randrange(size[1])) for _ in range(4)]
+            draw.line(points, fill=(20, 20, 20), width=4)
+        buffer = BytesIO()
+        image.save(buffer, "PNG")
+        doodles.append(buffer.getvalue())
+    return doodles
+
+
+def seed_users(sb, users, plants_per_user, seed=11):
+    """Synthetic users with gardens of `plants_per_user` plants, spread over a month"""
+    import achievements
+    import user_stats
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    user_ids = [f"00000000-0000-4000-8000-{i:012d}" for i in range(users)]
+    for user_id in user_ids:
+        rows = []
+        for i in range(plants_per_user):
+            created_at = now - timedelta(seconds=rng.randrange(30 * 86400))
+            rows.append({
+                "user_id": user_id, "height": rng.randrange(100, 401),
+                "branches": rng.randrange(1, 6),
+                "leaf_type": rng.choice(("round", "pointy", "heart")),
+                "color": rng.choice(("#2d5016", "#3d6b1f", "#4a7c2c", "#558b2f")),
+                "created_at": created_at.isoformat(timespec="microseconds")})
+        for start in range(0, len(rows), 1000):
+            sb.table("plants").insert(rows[start:start + 1000]).execute()
+        user_stats.rebuild_user_stats(sb, user_id)
+    achievements.backfill_achievements(sb)
+    return user_ids
+
+
+def make_token(user_id):
+    import jwt
+    return "Bearer " + jwt.encode(
+        {"sub": user_id, "email": f"{user_id[-4:]}@example.com",
+         "exp": int(time.time()) + 3600}, "bench", algorithm="HS256")
+
+
+def build_requests(doodles):
+    """Request kind -> fn(rng) returning (method, path, body, content type)"""
+    return {
+        "generate": lambda rng: ("POST", "/generate", rng.choice(doodles), "image/png"),
+        "plants": lambda rng: ("GET", "/plants?limit=50", None, None),
+        "plants_full": lambda rng: ("GET", "/plants", None, None),
+        "stats": lambda rng: ("GET", "/stats", None, None),
+        "credits": lambda rng: ("GET", "/credits", None, None),
+        "challenges": lambda rng: ("GET", "/challenges", None, None),
+        "leaderboard": lambda rng: ("GET", "/leaderboard", None, None),
+        "purchase": lambda rng: ("POST", "/purchase",
+                                 json.dumps({"cosmetic_id": rng.randrange(5)}),
+                                 "application/json"),
+    }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_size(args, garden_size):
+    """Seed one database, serve it, and load it; returns the results dict"""
+    import logging
+    from werkzeug.serving import make_server
+
+    sys.path.insert(0, ROOT)
+    import app as app_module
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    started = time.perf_counter()
+    user_ids = seed_users(app_module.supabase, args.users, garden_size)
+    seed_seconds = time.perf_counter() - started
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    tokens = [make_token(user_id) for user_id in user_ids]
+    kinds = build_requests(make_doodles())
+    mix = MIXES[args.mix]
+    names, weights = list(mix), list(mix.values())
+
+    def send(kind, token, rng):
+        method, path, body, content_type = kinds[kind](rng)
+        headers = {"Authorization": token}
+        if content_type:
+            headers["Content-Type"] = content_type
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        try:
+            start = time.perf_counter()
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status, (time.perf_counter() - start) * 1000
+        finally:
+            connection.close()
+
+    # Warm up every route for every user (lazy rows, leaderboard index)
+    for token in tokens:
+        for kind in names:
+            if kind not in ("generate", "purchase"):
+                send(kind, token, random.Random(0))
+
+    lock = threading.Lock()
+    remaining = [args.requests]
+    samples = {kind: [] for kind in names}
+    statuses = {kind: {} for kind in names}
+
+    def worker(worker_id):
+        rng = random.Random(worker_id)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            kind = rng.choices(names, weights)[0]
+            status, elapsed = send(kind, rng.choice(tokens), rng)
+            with lock:
+                samples[kind].append(elapsed)
+                statuses[kind][status] = statuses[kind].get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    routes = {}
+    for kind in names:
+        latencies = sorted(samples[kind])
+        routes[kind] = {
+            "requests": len(latencies),
+            "rps": len(latencies) / wall,
+            "errors": sum(n for status, n in statuses[kind].items() if status >= 500),
+            "statuses": {str(status): n for status, n in sorted(statuses[kind].items())},
+            **{f"p{pct}_ms": percentile(latencies, pct) for pct in PERCENTILES},
+        }
+    return {"garden_size": garden_size, "seed_seconds": seed_seconds,
+            "wall_seconds": wall, "rps": args.requests / wall, "routes": routes}
+
+
+def print_report(result):
+    print(f"\nGarden size {result['garden_size']}: {result['rps']:.1f} req/s overall "
+          f"(seeded in {result['seed_seconds']:.1f}s)")
+    print(f"{'route':<12} | {'requests':>8} {'rps':>8} | {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} | {'5xx':>4}")
+    print("-" * 70)
+    for kind, route in result["routes"].items():
+        print(f"{kind:<12} | {route['requests']:>8} {route['rps']:>8.1f} | "
+              f"{route['p50_ms']:>8.1f} {route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f} | "
+              f"{route['errors']:>4}")
+
+
+def compare(report, baseline, tolerance):
+    """Print per-route changes against a baseline; returns the regressions"""
+    previous = {str(r["garden_size"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with baseline from {baseline['created_at']} "
+          f"(tolerance {tolerance:.0%})")
+    if baseline["config"] != report["config"]:
+        print(f"  warning: baseline was run with {baseline['config']}")
+    for result in report["results"]:
+        before = previous.get(str(result["garden_size"]))
+        if before is None:
+            continue
+        for kind, route in result["routes"].items():
+            old = before["routes"].get(kind)
+            if not old or not old["p95_ms"] or not old["rps"]:
+                continue
+            p95_change = route["p95_ms"] / old["p95_ms"] - 1
+            rps_change = route["rps"] / old["rps"] - 1
+            flag = ""
+            if p95_change > tolerance or rps_change < -tolerance:
+                flag = "  REGRESSION"
+                regressions.append((result["garden_size"], kind))
+            print(f"  {result['garden_size']:>6} {kind:<12} p95 {p95_change:+7.1%}  "
+                  f"rps {rps_change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--garden-sizes", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="plants per user, one run each")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--latency-ms", type=float, default=0,
+                        help="simulated round trip per database call")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed p95/throughput change before flagging (0.2 = 20%%)")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size is not None:
+        print(json.dumps(run_size(args, args.size)))
+        return
+
+    env = dict(os.environ, STORAGE_BACKEND="sqlite", STORAGE_SQLITE_PATH=":memory:",
+               STORAGE_LATENCY_MS=str(args.latency_ms))
+    passthrough = ["--users", str(args.users), "--requests", str(args.requests),
+                   "--concurrency", str(args.concurrency), "--mix", args.mix]
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {"users": args.users, "requests": args.requests,
+                   "concurrency": args.concurrency, "mix": args.mix,
+                   "latency_ms": args.latency_ms, "python": sys.version.split()[0]},
+        "results": [],
+    }
+    for size in args.garden_sizes:
+        output = subprocess.run(
+            [sys.executable, __file__, "--size", str(size)] + passthrough,
+            env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        report["results"].append(result)
+        print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Daily challenge progress for Virtual Doodle Garden
+
+One `challenge_progress` row per user holds today's (UTC) progress: the
+distinct colors and leaf types drawn so far and the ids of single-plant
+challenges already met. It is folded forward whenever /generate inserts
+plants, so /challenges answers from that row alone and never reads plant
+rows. The fold runs inside the database (the record_challenge_progress
+function in SETUP_GUIDE.md) against the locked row, so concurrent
+/generate calls for one user cannot drop each other's colors.
+
+A row whose `day` is not today is yesterday's progress; it reads as empty
+and is started afresh by the first plant of the new day. A user without a
+row reads as empty too: reads never write, and the user's next plant
+builds the row from all of today's plants.
+
+Challenges in DAILY_CHALLENGES come in two kinds:
+  - "condition": met once any single plant satisfies it
+  - "distinct" + "target": met once that many distinct values of a plant
+    field were drawn in the day
+"""
+import logging
+from datetime import datetime
+import storage
+from funny_content import DAILY_CHALLENGES
+from user_stats import _plant_date
+
+log = logging.getLogger(__name__)
+
+PROGRESS_TABLE = "challenge_progress"
+
+# Plant field -> key in the progress row that collects its distinct values
+DISTINCT_FIELDS = {"color": "colors", "leaf_type": "leaf_types"}
+
+
+def _today():
+    return datetime.utcnow().date().isoformat()
+
+
+def empty_progress(user_id, day=None):
+    """Progress row for a user who has not drawn on `day`"""
+    return {
+        "user_id": user_id,
+        "day": day or _today(),
+        "colors": [],
+        "leaf_types": [],
+        "completed": [],
+    }
+
+
+def fold_plants(progress, plants):
+    """Fold newly created plants into a progress row (in place).
+
+    Plants from a later day than the row restart it; plants from an
+    earlier day are ignored.
+    """
+    for plant in plants:
+        plant_day = _plant_date(plant)
+        if plant_day < progress["day"]:
+            continue
+        if plant_day > progress["day"]:
+            progress.update(empty_progress(progress["user_id"], plant_day))
+
+        for field, key in DISTINCT_FIELDS.items():
+            values = progress.get(key) or []
+            if plant.get(field) and plant[field] not in values:
+                values = sorted(values + [plant[field]])
+            progress[key] = values
+
+        completed = progress.get("completed") or []
+        for challenge in DAILY_CHALLENGES:
+            if ("condition" in challenge
+                    and challenge["id"] not in completed
+                    and challenge["condition"](plant)):
+                completed = completed + [challenge["id"]]
+        progress["completed"] = completed
+    return progress
+
+
+def challenge_status(progress):
+    """The /challenges list built from a progress row"""
+    if progress.get("day") != _today():
+        progress = empty_progress(progress.get("user_id"))
+
+    statuses = []
+    for challenge in DAILY_CHALLENGES:
+        if "distinct" in challenge:
+            target = challenge["target"]
+            count = len(progress.get(DISTINCT_FIELDS[challenge["distinct"]]) or [])
+        else:
+            target = 1
+            count = 1 if challenge["id"] in (progress.get("completed") or []) else 0
+
+        statuses.append({
+            "id": challenge["id"],
+            "name": challenge["name"],
+            "emoji": challenge["emoji"],
+            "description": challenge["description"],
+            "reward": challenge["reward"],
+            "progress": min(count, target),
+            "target": target,
+            "completed": count >= target
+        })
+    return statuses
+
+
+def batch_progress(plants):
+    """record_challenge_progress parameters for a batch of new plants.
+
+    New plants are all from today, so only the newest plant's day counts.
+    """
+    day = max(_plant_date(plant) for plant in plants)
+    progress = fold_plants(empty_progress(None, day),
+                           [plant for plant in plants if _plant_date(plant) == day])
+    return {"p_day": day, "p_colors": progress["colors"],
+            "p_leaf_types": progress["leaf_types"], "p_completed": progress["completed"]}
+
+
+@storage.procedure("record_challenge_progress")
+def _record_challenge_progress(db, p_user_id, p_day, p_colors, p_leaf_types, p_completed):
+    """SQLite version of the record_challenge_progress function (SETUP_GUIDE.md)"""
+    db.table(PROGRESS_TABLE).upsert(
+        empty_progress(p_user_id, p_day), on_conflict="user_id",
+        ignore_duplicates=True).execute()
+    previous = db.table(PROGRESS_TABLE).select(
+        "*").eq("user_id", p_user_id).execute().data[0]
+    if p_day < previous["day"]:
+        return [{"previous": previous, "updated": previous}]
+    kept = previous if previous["day"] == p_day else empty_progress(p_user_id, p_day)
+    updated = db.table(PROGRESS_TABLE).update({
+        "day": p_day,
+        "colors": sorted(set(kept.get("colors") or []) | set(p_colors)),
+        "leaf_types": sorted(set(kept.get("leaf_types") or []) | set(p_leaf_types)),
+        "completed": sorted(set(kept.get("completed") or []) | set(p_completed)),
+        "updated_at": datetime.utcnow().isoformat(),
+    }).eq("user_id", p_user_id).execute().data[0]
+    return [{"previous": previous, "updated": updated}]
+
+
+def _todays_plants(sb, user_id):
+    response = sb.table("plants").select(
+        "height, branches, color, leaf_type, created_at").eq(
+        "user_id", user_id).gte("created_at", f"{_today()}T00:00:00").execute()
+    return response.data or []
+
+
+def _compute_from_plants(sb, user_id):
+    return fold_plants(empty_progress(user_id), _todays_plants(sb, user_id))
+
+
+def get_challenge_progress(sb, user_id):
+    """Read a user's progress row (a single-row lookup).
+
+    Users without a row get empty progress; nothing is written. If the
+    challenge_progress table is unavailable, progress is computed from
+    today's plants without being stored.
+    """
+    try:
+        response = sb.table(PROGRESS_TABLE).select(
+            "*").eq("user_id", user_id).limit(1).execute()
+        if response.data:
+            return response.data[0]
+        return empty_progress(user_id)
+    except Exception as e:
+        log.error("Error loading challenge progress: %s", e)
+        return _compute_from_plants(sb, user_id)
+
+
+def completed_challenges(progress):
+    """Ids of the challenges a progress row has completed today"""
+    return [status["id"] for status in challenge_status(progress)
+            if status["completed"]]
+
+
+def record_plants(sb, user_id, plants):
+    """Update a user's progress after their plants were inserted.
+
+    The batch's colors, leaf types and met challenges are unioned into
+    the row by one record_challenge_progress call. A user without a row
+    yet gets all of today's plants folded in (they include the new ones);
+    unions are safe to repeat, so a concurrent call doing the same is
+    harmless.
+    Returns (previous, updated) rows, or (None, None) if the update failed.
+    """
+    try:
+        response = sb.table(PROGRESS_TABLE).select(
+            "day").eq("user_id", user_id).limit(1).execute()
+        if not response.data:
+            plants = _todays_plants(sb, user_id) or plants
+        response = sb.rpc("record_challenge_progress", {
+            "p_user_id": user_id, **batch_progress(plants)}).execute()
+        return response.data[0]["previous"], response.data[0]["updated"]
+    except Exception as e:
+        log.error("Error updating challenge progress: %s", e)
+        return None, None
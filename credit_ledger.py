@@ -0,0 +1,489 @@
+"""Credit ledger for Virtual Doodle Garden
+
+Every credit change is appended to `credit_ledger` (plants, achievements,
+streak days, mini-games, purchases) and folded into a materialized
+per-user row in `credit_balances`, so /credits is a single-row read.
+
+The original recompute formula,
+
+    plants x 10 + achievements x 25 + streak x 5 + minigame credits - spent
+
+is kept as calculate_total_credits(). It opens the ledger for users who
+predate it, and the reconciliation job checks the ledger against it:
+
+    python credit_ledger.py --reconcile            # report every user
+    python credit_ledger.py --reconcile <user_id>  # report one user
+    python credit_ledger.py --reconcile --fix      # also post corrections
+
+Streak credit follows the current streak, so when a streak ends a
+compensating "streak_expired" entry takes its credit back.
+"""
+import logging
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+import storage
+from achievements import get_user_achievements, get_user_streak
+from fanout import run_concurrently
+from funny_content import COSMETICS_SHOP
+
+log = logging.getLogger(__name__)
+
+load_dotenv()
+
+LEDGER_TABLE = "credit_ledger"
+BALANCE_TABLE = "credit_balances"
+
+PLANT_CREDITS = 10
+ACHIEVEMENT_CREDITS = 25
+STREAK_DAY_CREDITS = 5
+
+# Ledger source -> (balance amount column, balance quantity column)
+SOURCE_COLUMNS = {
+    "plant": ("plant_credits", "plants"),
+    "achievement": ("achievement_bonus", "achievements"),
+    "streak": ("streak_bonus", "streak"),
+    "minigame": ("minigame_credits", None),
+    "purchase": ("spent_credits", None),
+}
+
+
+# ========== RECOMPUTE FORMULA ==========
+def _load_plant_count(sb, user_id):
+    # Counted from the plants themselves, not user_stats: the formula is
+    # what the ledger is opened from and reconciled against
+    response = sb.table("plants").select("id", count="exact").eq(
+        "user_id", user_id).limit(1).execute()
+    return response.count if response.count is not None else len(response.data or [])
+
+
+def _load_achievement_count(sb, user_id):
+    return len(get_user_achievements(sb, user_id))
+
+
+def _load_minigame_credits(sb, user_id):
+    scores = storage.fetch_all(lambda: sb.table("minigame_scores").select(
+        "credits_awarded").eq("user_id", user_id).order("id"))
+    return sum(row.get("credits_awarded", 0) for row in scores)
+
+
+def cosmetic_price(cid):
+    """Price of an owned cosmetic id (shop index or key), 0 if unknown"""
+    if cid is None:
+        return 0
+    if isinstance(cid, str) and cid.isdigit():
+        cid = int(cid)
+    if isinstance(cid, int) and 0 <= cid < len(COSMETICS_SHOP):
+        return COSMETICS_SHOP[cid]["price"]
+    for cosmetic in COSMETICS_SHOP:
+        if cosmetic.get("id") == cid:
+            return cosmetic["price"]
+    return 0
+
+
+def _load_spent_credits(sb, user_id):
+    owned_response = sb.table("user_cosmetics").select(
+        "cosmetic_id").eq("user_id", user_id).execute()
+    return sum(cosmetic_price(item.get("cosmetic_id"))
+               for item in (owned_response.data or []))
+
+
+def calculate_total_credits(sb, user_id):
+    """Calculate total credits from scratch, including mini-game awards.
+
+    The five sources are independent, so they are read concurrently under
+    one shared deadline. A source that fails or times out counts as 0 and
+    is named in the breakdown's "failed" list.
+    """
+    sources, timings = run_concurrently({
+        "plants": (lambda: _load_plant_count(sb, user_id), 0, "plants for credits"),
+        "achievements": (lambda: _load_achievement_count(sb, user_id), 0, "achievements for credits"),
+        "streak": (lambda: get_user_streak(sb, user_id), 0, "streak for credits"),
+        "minigames": (lambda: _load_minigame_credits(sb, user_id), 0, "minigame credits"),
+        "spent": (lambda: _load_spent_credits(sb, user_id), 0, "spent credits"),
+    })
+
+    plant_count = sources["plants"]
+    achievement_count = sources["achievements"]
+    streak = sources["streak"]
+    minigame_credits = sources["minigames"]
+    spent_credits = sources["spent"]
+
+    achievement_bonus = achievement_count * ACHIEVEMENT_CREDITS
+    streak_bonus = streak * STREAK_DAY_CREDITS
+    earned_credits = (plant_count * PLANT_CREDITS) + achievement_bonus + \
+        streak_bonus + minigame_credits
+    total_credits = max(0, earned_credits - spent_credits)
+
+    return total_credits, {
+        "plants": plant_count,
+        "achievements": achievement_count,
+        "streak": streak,
+        "plant_credits": plant_count * PLANT_CREDITS,
+        "achievement_bonus": achievement_bonus,
+        "streak_bonus": streak_bonus,
+        "minigame_credits": minigame_credits,
+        "spent_credits": spent_credits,
+        "earned_credits": earned_credits,
+        "failed": sorted(name for name, ms in timings.items() if ms is None),
+        "timings_ms": timings
+    }
+
+
+def _complete_formula(sb, user_id):
+    """The recompute breakdown, or RuntimeError if any source failed.
+
+    Anything written from the formula (an opening balance, a
+    reconciliation) would otherwise persist a failed source as 0.
+    """
+    _, breakdown = calculate_total_credits(sb, user_id)
+    if breakdown["failed"]:
+        raise RuntimeError(f"credit sources unavailable: {', '.join(breakdown['failed'])}")
+    return breakdown
+
+
+# ========== LEDGER ENTRIES ==========
+def _today():
+    return datetime.utcnow().date().isoformat()
+
+
+def entry(source, reason, amount, quantity=0, ref=None):
+    """One ledger line. Purchases carry a negative amount."""
+    return {
+        "source": source,
+        "reason": reason,
+        "amount": amount,
+        "quantity": quantity,
+        "ref": None if ref is None else str(ref),
+    }
+
+
+def plant_entries(plants):
+    return [entry("plant", "plant_created", PLANT_CREDITS, 1, p.get("id"))
+            for p in plants]
+
+
+def achievement_entries(achievements):
+    return [entry("achievement", "achievement_awarded", ACHIEVEMENT_CREDITS, 1,
+                  a.get("achievement_id")) for a in achievements]
+
+
+def minigame_entry(game, credits):
+    return entry("minigame", "minigame_completed", credits, 1, game)
+
+
+def purchase_entry(cosmetic_id, price):
+    return entry("purchase", "cosmetic_purchased", -price, 1, cosmetic_id)
+
+
+def streak_entry(balance, streak):
+    """Entry moving credited streak days to `streak`, or None if unchanged"""
+    delta = streak - (balance.get("streak") or 0)
+    if not delta:
+        return None
+    reason = "streak_advanced" if delta > 0 else "streak_expired"
+    return entry("streak", reason, delta * STREAK_DAY_CREDITS, delta)
+
+
+# ========== MATERIALIZED BALANCE ==========
+# Ledger rows and the balance row are only written by the database
+# functions in SETUP_GUIDE.md (open_credit_account, post_credit_entries,
+# purchase_cosmetic, rebuild_credit_balance). Each locks the user's
+# balance row, appends its lines and adds them to the row in one
+# transaction, so concurrent events cannot overwrite each other and a
+# purchase's credit check sees every earlier spend.
+
+def empty_balance(user_id):
+    balance = {"user_id": user_id, "streak_day": None}
+    for amount_col, quantity_col in SOURCE_COLUMNS.values():
+        balance[amount_col] = 0
+        if quantity_col:
+            balance[quantity_col] = 0
+    return balance
+
+
+def apply_entry(balance, line):
+    """Fold one ledger line into a balance row (in place)"""
+    amount_col, quantity_col = SOURCE_COLUMNS[line["source"]]
+    if line["source"] == "purchase":
+        balance[amount_col] = (balance.get(amount_col) or 0) - line["amount"]
+    else:
+        balance[amount_col] = (balance.get(amount_col) or 0) + line["amount"]
+    if quantity_col:
+        balance[quantity_col] = (balance.get(quantity_col) or 0) + \
+            (line.get("quantity") or 0)
+    if line["source"] == "streak":
+        balance["streak_day"] = (line.get("created_at") or _today())[:10]
+    return balance
+
+
+def earned_credits(balance):
+    return sum(balance.get(SOURCE_COLUMNS[s][0]) or 0
+               for s in ("plant", "achievement", "streak", "minigame"))
+
+
+def total_credits(balance):
+    return max(0, earned_credits(balance) - (balance.get("spent_credits") or 0))
+
+
+def _fetch_balance(sb, user_id):
+    response = sb.table(BALANCE_TABLE).select(
+        "*").eq("user_id", user_id).limit(1).execute()
+    return response.data[0] if response.data else None
+
+
+def _call(sb, function, params):
+    """First row returned by a ledger function, or None"""
+    response = sb.rpc(function, params).execute()
+    return response.data[0] if response.data else None
+
+
+def open_account(sb, user_id):
+    """Seed a user's ledger from the recompute formula.
+
+    If another request opened the account first, its row is returned and
+    nothing is written. Raises RuntimeError without writing if any source
+    of the formula failed; callers fall back to the recompute.
+    """
+    breakdown = _complete_formula(sb, user_id)
+    lines = [
+        entry("plant", "opening_balance", breakdown["plant_credits"], breakdown["plants"]),
+        entry("achievement", "opening_balance", breakdown["achievement_bonus"], breakdown["achievements"]),
+        entry("streak", "opening_balance", breakdown["streak_bonus"], breakdown["streak"]),
+        entry("minigame", "opening_balance", breakdown["minigame_credits"]),
+        entry("purchase", "opening_balance", -breakdown["spent_credits"]),
+    ]
+    lines = [line for line in lines if line["amount"] or line["quantity"]]
+    return _call(sb, "open_credit_account", {"p_user_id": user_id, "p_entries": lines})
+
+
+def post_entries(sb, user_id, lines, streak=None):
+    """Record credit events that have already been written to their tables.
+
+    Pass `streak` (the user's current streak) after plant creation so
+    streak credit follows it. A user without a ledger yet gets it opened
+    from the recompute formula, which already includes these events.
+    """
+    try:
+        balance = _call(sb, "post_credit_entries", {
+            "p_user_id": user_id, "p_entries": [line for line in lines if line],
+            "p_streak": streak})
+        if balance is None:
+            return open_account(sb, user_id)
+        return balance
+    except Exception as e:
+        log.error("Error posting credit ledger entries: %s", e)
+        return None
+
+
+def get_balance(sb, user_id):
+    """The user's materialized balance row (a single-row read).
+
+    Streak credit only holds while the streak does: if the streak was
+    last credited before today, its credit is taken back first (checked
+    again under the row lock, in case a plant just extended it).
+    """
+    balance = _fetch_balance(sb, user_id)
+    if balance is None:
+        return open_account(sb, user_id)
+    if balance.get("streak") and (balance.get("streak_day") or "") < _today():
+        balance = _call(sb, "post_credit_entries",
+                        {"p_user_id": user_id, "p_entries": []}) or balance
+    return balance
+
+
+def buy_cosmetic(sb, user_id, cosmetic_id, price):
+    """Spend credits on a cosmetic.
+
+    The balance check, the user_cosmetics row and the purchase entry are
+    one transaction. Returns (status, balance row) where status is
+    "purchased", "insufficient" or "owned".
+    """
+    params = {"p_user_id": user_id, "p_cosmetic_id": str(cosmetic_id),
+              "p_entry": purchase_entry(cosmetic_id, price)}
+    result = _call(sb, "purchase_cosmetic", params)
+    if result["status"] == "no_account":
+        open_account(sb, user_id)
+        result = _call(sb, "purchase_cosmetic", params)
+    return result["status"], result["account"]
+
+
+# SQLite versions of the functions above (see storage.procedure)
+
+def _apply_sqlite(db, user_id, balance, lines, streak_day=None):
+    lines = [dict(line, user_id=user_id) for line in lines]
+    if lines:
+        db.table(LEDGER_TABLE).insert(lines).execute()
+    for line in lines:
+        apply_entry(balance, line)
+    if streak_day:
+        balance["streak_day"] = streak_day
+    balance["balance"] = total_credits(balance)
+    balance["updated_at"] = datetime.utcnow().isoformat()
+    return db.table(BALANCE_TABLE).update(balance).eq(
+        "user_id", user_id).execute().data[0]
+
+
+def _locked_balance(db, user_id):
+    found = db.table(BALANCE_TABLE).select("*").eq("user_id", user_id).execute().data
+    return found[0] if found else None
+
+
+@storage.procedure("open_credit_account")
+def _open_credit_account(db, p_user_id, p_entries):
+    opened = db.table(BALANCE_TABLE).upsert(
+        empty_balance(p_user_id), on_conflict="user_id", ignore_duplicates=True).execute().data
+    if not opened:
+        return [_locked_balance(db, p_user_id)]
+    return [_apply_sqlite(db, p_user_id, opened[0], p_entries)]
+
+
+@storage.procedure("post_credit_entries")
+def _post_credit_entries(db, p_user_id, p_entries, p_streak=None):
+    balance = _locked_balance(db, p_user_id)
+    if balance is None:
+        return []
+    streak = p_streak
+    if streak is None and (balance.get("streak_day") or "") < _today():
+        # Last credited before today: the streak has ended
+        streak = 0
+    line = streak_entry(balance, streak) if streak is not None else None
+    lines = list(p_entries) + ([line] if line else [])
+    touched = bool(line) or bool(p_streak)
+    return [_apply_sqlite(db, p_user_id, balance, lines,
+                          streak_day=_today() if touched else None)]
+
+
+@storage.procedure("purchase_cosmetic")
+def _purchase_cosmetic(db, p_user_id, p_cosmetic_id, p_entry):
+    balance = _locked_balance(db, p_user_id)
+    if balance is None:
+        return [{"status": "no_account", "account": None}]
+    if (balance.get("balance") or 0) < -p_entry["amount"]:
+        return [{"status": "insufficient", "account": balance}]
+    owned = db.table("user_cosmetics").select("id").eq(
+        "user_id", p_user_id).eq("cosmetic_id", p_cosmetic_id).limit(1).execute().data
+    if owned:
+        return [{"status": "owned", "account": balance}]
+    db.table("user_cosmetics").insert(
+        {"user_id": p_user_id, "cosmetic_id": p_cosmetic_id, "owned": True}).execute()
+    return [{"status": "purchased",
+             "account": _apply_sqlite(db, p_user_id, balance, [p_entry])}]
+
+
+@storage.procedure("rebuild_credit_balance")
+def _rebuild_credit_balance(db, p_user_id):
+    stored = _locked_balance(db, p_user_id)
+    balance = _ledger_balance(db, p_user_id)
+    if stored and (stored.get("streak_day") or "") > (balance.get("streak_day") or ""):
+        balance["streak_day"] = stored["streak_day"]
+    balance["balance"] = total_credits(balance)
+    balance["updated_at"] = datetime.utcnow().isoformat()
+    return db.table(BALANCE_TABLE).upsert(balance, on_conflict="user_id").execute().data
+
+
+def credits_breakdown(balance):
+    """The calculate_total_credits() breakdown, served from a balance row"""
+    return {
+        "plants": balance.get("plants") or 0,
+        "achievements": balance.get("achievements") or 0,
+        "streak": balance.get("streak") or 0,
+        "plant_credits": balance.get("plant_credits") or 0,
+        "achievement_bonus": balance.get("achievement_bonus") or 0,
+        "streak_bonus": balance.get("streak_bonus") or 0,
+        "minigame_credits": balance.get("minigame_credits") or 0,
+        "spent_credits": balance.get("spent_credits") or 0,
+        "earned_credits": earned_credits(balance),
+    }
+
+
+# ========== RECONCILIATION ==========
+def _ledger_balance(sb, user_id):
+    lines = storage.fetch_all(lambda: sb.table(LEDGER_TABLE).select(
+        "source, reason, amount, quantity, created_at").eq(
+        "user_id", user_id).order("created_at").order("id"))
+    balance = empty_balance(user_id)
+    for line in lines:
+        apply_entry(balance, line)
+    return balance
+
+
+def reconcile_user(sb, user_id, fix=False):
+    """Compare a user's ledger with the recompute formula.
+
+    Returns a dict of {column: (ledger value, formula value)} for every
+    mismatch. With fix=True "reconciliation" entries are posted to match
+    the formula and the balance row is rebuilt from the ledger. Raises
+    RuntimeError if any source of the formula failed.
+    """
+    ledger = _ledger_balance(sb, user_id)
+    formula = _complete_formula(sb, user_id)
+
+    mismatches = {}
+    corrections = []
+    for source, (amount_col, quantity_col) in SOURCE_COLUMNS.items():
+        have, want = ledger.get(amount_col) or 0, formula[amount_col]
+        have_qty = (ledger.get(quantity_col) or 0) if quantity_col else 0
+        want_qty = formula[quantity_col] if quantity_col else 0
+        if have != want or have_qty != want_qty:
+            mismatches[amount_col] = (have, want)
+            amount = want - have
+            corrections.append(entry(source, "reconciliation",
+                                     -amount if source == "purchase" else amount,
+                                     want_qty - have_qty))
+
+    stored = _fetch_balance(sb, user_id)
+    if stored is None or total_credits(stored) != total_credits(ledger):
+        mismatches["balance_row"] = (
+            None if stored is None else total_credits(stored), total_credits(ledger))
+
+    if fix and mismatches:
+        if corrections and _call(sb, "post_credit_entries", {
+                "p_user_id": user_id, "p_entries": corrections}) is None:
+            _call(sb, "open_credit_account", {"p_user_id": user_id, "p_entries": corrections})
+        # Any drift of the stored row from its ledger
+        _call(sb, "rebuild_credit_balance", {"p_user_id": user_id})
+    return mismatches
+
+
+def reconcile_all(sb, fix=False):
+    """Reconcile every user that has a ledger; returns {user_id: mismatches}"""
+    rows = storage.fetch_all(
+        lambda: sb.table(BALANCE_TABLE).select("user_id").order("user_id"))
+    report = {}
+    for row in rows:
+        try:
+            mismatches = reconcile_user(sb, row["user_id"], fix=fix)
+        except RuntimeError as e:
+            log.error("Skipping reconciliation for %s: %s", row["user_id"], e)
+            continue
+        if mismatches:
+            report[row["user_id"]] = mismatches
+    return report
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "--reconcile":
+        print(__doc__)
+        sys.exit(1)
+
+    import storage
+    # Reading other users' ledgers needs a key that bypasses RLS
+    client = storage.connect(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY"))
+
+    fix = "--fix" in args
+    user_ids = [a for a in args[1:] if not a.startswith("--")]
+    if user_ids:
+        report = {uid: reconcile_user(client, uid, fix=fix) for uid in user_ids}
+        report = {uid: m for uid, m in report.items() if m}
+    else:
+        report = reconcile_all(client, fix=fix)
+
+    for user_id, mismatches in report.items():
+        for column, (ledger_value, formula_value) in mismatches.items():
+            print(f"{user_id} {column}: ledger={ledger_value} formula={formula_value}")
+    print(f"{len(report)} user(s) out of balance" + (" (fixed)" if fix and report else ""))
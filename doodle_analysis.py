@@ -0,0 +1,195 @@
+"""Doodle analysis for Virtual Doodle Garden
+
+Turns a canvas image into the numbers /generate uses to grow a plant.
+Everything is computed from Pillow's C-level reductions (histogram,
+bounding box, box-filter projections) so no per-pixel Python objects are
+ever created, no matter how large the canvas is.
+"""
+import os
+import time
+from io import BytesIO
+from PIL import Image
+
+# Largest image (width x height) we are willing to decode at all
+MAX_PIXELS = int(os.getenv("DOODLE_MAX_PIXELS", str(4096 * 4096)))
+
+# Images are box-reduced so their longest side is at most this before the
+# spatial analysis passes. Plant height is not affected (see analyze_image).
+ANALYSIS_MAX_SIDE = int(os.getenv("DOODLE_ANALYSIS_MAX_SIDE", "512"))
+
+# Pixels darker than this (0-255 grayscale) count as ink
+INK_THRESHOLD = 128
+
+# Grayscale value reported when an image has no pixels at all
+EMPTY_IMAGE_DARKNESS = 128
+
+# Plant height range driven by darkness (px)
+MIN_PLANT_HEIGHT = 100
+PLANT_HEIGHT_RANGE = 300
+
+_INK_MASK_LUT = [255 if v < INK_THRESHOLD else 0 for v in range(256)]
+_INK_WEIGHT_LUT = [255 - v for v in range(256)]
+
+
+class DoodleTooLarge(Exception):
+    """Raised when an image exceeds the MAX_PIXELS budget"""
+
+
+def height_from_darkness(darkness_ratio):
+    """Map a 0-1 darkness ratio to a plant height (darker = taller)"""
+    return int(MIN_PLANT_HEIGHT + (darkness_ratio * PLANT_HEIGHT_RANGE))
+
+
+def _center_of_mass(grayscale):
+    """Ink-weighted center of mass as (x, y) fractions of width/height.
+
+    The image is collapsed to one row and one column with a box filter,
+    so only width + height values ever reach Python.
+    """
+    width, height = grayscale.size
+    ink = grayscale.point(_INK_WEIGHT_LUT).convert("F")
+
+    columns = list(ink.resize((width, 1), Image.Resampling.BOX).getdata())
+    rows = list(ink.resize((1, height), Image.Resampling.BOX).getdata())
+
+    total = sum(columns)
+    if total <= 0:
+        return None
+
+    center_x = sum((x + 0.5) * w for x, w in enumerate(columns)) / total
+    center_y = sum((y + 0.5) * w for y, w in enumerate(rows)) / sum(rows)
+    return (round(center_x / width, 4), round(center_y / height, 4))
+
+
+def _tone_features(grayscale):
+    """Darkness and ink coverage from one histogram pass"""
+    width, height = grayscale.size
+    total_pixels = width * height
+
+    histogram = grayscale.histogram()
+    if total_pixels:
+        weighted = sum(value * count for value, count in enumerate(histogram))
+        avg_darkness = weighted / total_pixels
+        ink_coverage = sum(histogram[:INK_THRESHOLD]) / total_pixels
+    else:
+        avg_darkness = EMPTY_IMAGE_DARKNESS
+        ink_coverage = 0.0
+
+    darkness_ratio = 1 - (avg_darkness / 255)
+    return {
+        "avg_darkness": avg_darkness,
+        "darkness_ratio": darkness_ratio,
+        "height": height_from_darkness(darkness_ratio),
+        "ink_coverage": round(ink_coverage, 4),
+    }
+
+
+def analyze_grayscale(grayscale):
+    """Analyze an "L" mode image and return its doodle features.
+
+    Returned keys:
+        avg_darkness   - mean grayscale value (0 = black, 255 = white)
+        darkness_ratio - 0 (blank) to 1 (solid ink)
+        height         - plant height derived from darkness_ratio
+        ink_coverage   - fraction of pixels darker than INK_THRESHOLD
+        bbox           - (left, top, right, bottom) of the strokes, or None
+        center_of_mass - ink-weighted (x, y) as 0-1 fractions, or None
+        width, height_px - analyzed image size
+        analysis_factor - reduction applied before analysis (1 = none)
+    """
+    width, height = grayscale.size
+    features = _tone_features(grayscale)
+
+    bbox = None
+    center_of_mass = None
+    if features["ink_coverage"] > 0:
+        bbox = grayscale.point(_INK_MASK_LUT).getbbox()
+        center_of_mass = _center_of_mass(grayscale)
+
+    features.update({
+        "bbox": bbox,
+        "center_of_mass": center_of_mass,
+        "width": width,
+        "height_px": height,
+        "analysis_factor": 1,
+    })
+    return features
+
+
+def check_pixel_budget(image, max_pixels=MAX_PIXELS):
+    """Reject an opened (not yet decoded) image that is over budget"""
+    width, height = image.size
+    if width * height > max_pixels:
+        raise DoodleTooLarge(
+            f"Image is {width}x{height}; the limit is {max_pixels} pixels")
+
+
+def analysis_factor(size, max_side=ANALYSIS_MAX_SIDE):
+    """Integer reduction factor that brings the longest side under max_side"""
+    longest = max(size)
+    if max_side <= 0 or longest <= max_side:
+        return 1
+    return -(-longest // max_side)
+
+
+def analyze_image(image):
+    """Convert any Pillow image to grayscale and analyze it.
+
+    Large images are box-reduced to ANALYSIS_MAX_SIDE before the spatial
+    passes (bbox, center of mass), which are reported in original pixel
+    coordinates and are approximate: strokes fainter than INK_THRESHOLD
+    after averaging drop out of the bbox. Darkness and ink coverage
+    always come from the histogram of the full-resolution grayscale copy
+    (one C pass over a buffer of width x height bytes), so plant height
+    is exactly the full-resolution result.
+    """
+    grayscale = image.convert("L")
+    factor = analysis_factor(grayscale.size)
+    if factor == 1:
+        return analyze_grayscale(grayscale)
+
+    original_width, original_height = grayscale.size
+    features = analyze_grayscale(grayscale.reduce(factor))
+    features.update(_tone_features(grayscale))
+    if features["bbox"]:
+        left, top, right, bottom = features["bbox"]
+        features["bbox"] = (left * factor, top * factor,
+                            min(right * factor, original_width),
+                            min(bottom * factor, original_height))
+    features["width"] = original_width
+    features["height_px"] = original_height
+    features["analysis_factor"] = factor
+    return features
+
+
+def analyze_image_file(fp, max_pixels=MAX_PIXELS):
+    """Decode an encoded image from a seekable file object and analyze it.
+
+    The decoder reads straight from ``fp`` so callers can hand over an
+    upload stream without copying it into bytes first. Image.open only
+    parses the header, so the pixel budget is enforced before any pixel
+    data is decoded.
+
+    The features also carry the image `format` and `timings` (seconds
+    spent decoding and analyzing) for the metrics endpoint.
+    """
+    started = time.perf_counter()
+    try:
+        image = Image.open(fp)
+    except Image.DecompressionBombError as e:
+        raise DoodleTooLarge(str(e))
+
+    with image:
+        check_pixel_budget(image, max_pixels)
+        image.load()
+        decoded = time.perf_counter()
+        features = analyze_image(image)
+        features["format"] = image.format
+        features["timings"] = {"decode": decoded - started,
+                               "analyze": time.perf_counter() - decoded}
+        return features
+
+
+def analyze_image_bytes(image_bytes):
+    """Decode encoded image bytes (PNG, WebP, ...) and analyze them"""
+    return analyze_image_file(BytesIO(image_bytes))
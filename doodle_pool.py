@@ -0,0 +1,153 @@
+"""Process-pool stage for doodle decoding and analysis
+
+PIL decoding and pixel analysis hold the GIL, so running them on the
+request thread lets one large doodle stall every other request on the
+worker. When DOODLE_POOL_WORKERS > 0 the work is shipped to a warm pool
+of worker processes instead.
+
+The pool is bounded: at most DOODLE_POOL_WORKERS + DOODLE_POOL_QUEUE jobs
+may be running or waiting at once. Submitting beyond that raises
+DoodlePoolBusy straight away (the route answers 503 + Retry-After) rather
+than letting requests pile up. A batch larger than that bound could never
+be queued, so callers cap batches at capacity(). Each job is given DOODLE_POOL_TIMEOUT
+seconds before DoodlePoolTimeout is raised.
+
+With DOODLE_POOL_WORKERS = 0 (the default) everything runs inline.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+
+import metrics
+from doodle_analysis import analyze_image_bytes, analyze_image_file
+
+POOL_WORKERS = int(os.getenv("DOODLE_POOL_WORKERS", "0"))
+POOL_QUEUE = int(os.getenv("DOODLE_POOL_QUEUE", str(POOL_WORKERS * 4)))
+JOB_TIMEOUT = float(os.getenv("DOODLE_POOL_TIMEOUT", "5"))
+RETRY_AFTER = int(os.getenv("DOODLE_POOL_RETRY_AFTER", "1"))
+
+_executor = None
+_capacity = 0
+_in_flight = 0
+_lock = threading.Lock()
+
+
+class DoodlePoolBusy(Exception):
+    """Raised when the pool queue is full; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__("Doodle analysis queue is full")
+        self.retry_after = retry_after
+
+
+class DoodlePoolTimeout(Exception):
+    """Raised when a doodle takes longer than JOB_TIMEOUT to analyze"""
+
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__("Doodle analysis timed out")
+        self.retry_after = retry_after
+
+
+def _warm_up():
+    """No-op run in each worker so it is spawned and has PIL imported"""
+    return os.getpid()
+
+
+def start_pool(workers=POOL_WORKERS, queue_size=POOL_QUEUE):
+    """Create the process pool and spawn every worker up front"""
+    global _executor, _capacity
+    if workers <= 0 or _executor is not None:
+        return
+    _executor = ProcessPoolExecutor(max_workers=workers)
+    _capacity = workers + max(0, queue_size)
+
+    # Submitting one job per worker at once forces all of them to spawn
+    warmups = [_executor.submit(_warm_up) for _ in range(workers)]
+    for future in warmups:
+        future.result()
+    atexit.register(stop_pool)
+
+
+def stop_pool():
+    """Shut the pool down, dropping any queued jobs"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _release(_future):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _reserve(count):
+    global _in_flight
+    with _lock:
+        if _in_flight + count > _capacity:
+            raise DoodlePoolBusy()
+        _in_flight += count
+
+
+def capacity():
+    """Most doodles one submit_many call can queue, or None when running inline"""
+    return _capacity if _executor is not None else None
+
+
+def _run_inline(doodle):
+    future = Future()
+    try:
+        future.set_result(analyze_image_file(doodle))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def submit_many(doodles):
+    """Submit file objects for analysis and return one Future per doodle.
+
+    Capacity for the whole list is reserved atomically, so a request is
+    either fully queued or rejected with DoodlePoolBusy. Lists longer than
+    capacity() are rejected with ValueError, since they would never fit.
+    """
+    if _executor is None:
+        return [_run_inline(doodle) for doodle in doodles]
+
+    if len(doodles) > _capacity:
+        raise ValueError(f"Cannot queue {len(doodles)} doodles (capacity {_capacity})")
+    _reserve(len(doodles))
+    futures = []
+    for i, doodle in enumerate(doodles):
+        try:
+            future = _executor.submit(analyze_image_bytes, doodle.read())
+        except Exception:
+            # Give back the slots of everything we did not submit
+            for _ in doodles[i:]:
+                _release(None)
+            raise
+        future.add_done_callback(_release)
+        futures.append(future)
+    return futures
+
+
+def wait_for_doodle(future):
+    """Wait for a submitted doodle, raising DoodlePoolTimeout if it is slow"""
+    try:
+        features = future.result(timeout=JOB_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise DoodlePoolTimeout()
+    metrics.observe_doodle(features)
+    return features
+
+
+def pool_stats():
+    return {"workers": POOL_WORKERS if _executor else 0,
+            "capacity": _capacity, "in_flight": _in_flight}
+
+
+def analyze_doodle(doodle):
+    """Analyze one uploaded doodle through the pool (or inline)"""
+    return wait_for_doodle(submit_many([doodle])[0])
@@ -0,0 +1,120 @@
+"""Concurrent fan-out for independent blocking reads
+
+Supabase calls block on the network, so several independent reads can
+share one wall-clock wait instead of paying each latency in turn.
+A module-level thread pool is shared by every request. Sync code uses
+run_concurrently; async views await the same pool through run_io and
+gather_io.
+
+Work already running on the pool (a /garden/bootstrap section, a call
+awaited through run_io) that fans out again runs its tasks inline, one
+after another. Waiting on the bounded pool from one of its own threads
+deadlocks once every worker is doing the same.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+log = logging.getLogger(__name__)
+
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "16"))
+FANOUT_DEADLINE = float(os.getenv("FANOUT_DEADLINE_SECONDS", "3"))
+
+_worker = threading.local()
+
+
+def _mark_worker():
+    _worker.active = True
+
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS,
+                               thread_name_prefix="fanout",
+                               initializer=_mark_worker)
+
+
+def _run_inline(tasks, deadline):
+    """run_concurrently for callers already on a pool thread"""
+    results = {}
+    timings = {}
+    expires = time.perf_counter() + deadline
+    for name, (fn, default, label) in tasks.items():
+        if time.perf_counter() >= expires:
+            log.warning("Error loading %s: timed out after %ss", label, deadline)
+            results[name], timings[name] = default, None
+            continue
+        start = time.perf_counter()
+        try:
+            value = fn()
+        except Exception as e:
+            log.error("Error loading %s: %s", label, e)
+            results[name], timings[name] = default, None
+            continue
+        results[name] = value
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    return results, timings
+
+
+def run_concurrently(tasks, deadline=FANOUT_DEADLINE):
+    """Run independent zero-argument callables concurrently.
+
+    `tasks` maps a name to (fn, default, label). Every task shares one
+    deadline. A task that raises or misses the deadline is logged as
+    "Error loading {label}" and its default is used instead, so one slow
+    or failing source never fails the whole request.
+
+    Returns (results, timings) where timings holds milliseconds per task
+    (None for tasks that missed the deadline).
+    """
+    if getattr(_worker, "active", False):
+        return _run_inline(tasks, deadline)
+
+    def run(fn):
+        start = time.perf_counter()
+        value = fn()
+        return value, (time.perf_counter() - start) * 1000
+
+    # Each task runs in a copy of the caller's context so request-scoped
+    # state (e.g. the query cache) follows it into the worker thread
+    futures = {name: _executor.submit(contextvars.copy_context().run, run, fn)
+               for name, (fn, _, _) in tasks.items()}
+    wait(futures.values(), timeout=deadline)
+
+    results = {}
+    timings = {}
+    for name, future in futures.items():
+        _, default, label = tasks[name]
+        if not future.done():
+            future.cancel()
+            log.warning("Error loading %s: timed out after %ss", label, deadline)
+            results[name], timings[name] = default, None
+            continue
+        try:
+            value, elapsed_ms = future.result()
+            results[name], timings[name] = value, round(elapsed_ms, 1)
+        except Exception as e:
+            log.error("Error loading %s: %s", label, e)
+            results[name], timings[name] = default, None
+    return results, timings
+
+
+async def run_io(fn, *args):
+    """Await a blocking call (e.g. a Supabase execute()) from a coroutine.
+
+    The call runs on the shared fan-out pool in a copy of the caller's
+    context, so the event loop stays free to drive other awaits.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, contextvars.copy_context().run, fn, *args)
+
+
+async def gather_io(*calls):
+    """Await several independent blocking calls at once.
+
+    Each call is (fn, *args); results come back in the same order.
+    """
+    return await asyncio.gather(*(run_io(fn, *args) for fn, *args in calls))
@@ -39,7 +39,8 @@ DAILY_CHALLENGES = [
         "emoji": "🌈",
         "description": "Create plants in 3 different colors today",
         "reward": 100,
-        "condition": lambda plants: len(set(p.get("color") for p in plants)) >= 3
+        "distinct": "color",
+        "target": 3
     },
     {
         "id": "leaf_explorer",
@@ -47,7 +48,8 @@ DAILY_CHALLENGES = [
         "emoji": "🍃",
         "description": "Use all 3 leaf types in one day",
         "reward": 80,
-        "condition": lambda plants: len(set(p.get("leaf_type") for p in plants)) >= 3
+        "distinct": "leaf_type",
+        "target": 3
     },
 ]
 
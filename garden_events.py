@@ -0,0 +1,158 @@
+"""Per-user garden event stream for Virtual Doodle Garden
+
+The server publishes an event whenever it writes something a garden page
+shows: a plant was created, an achievement was awarded, the credit
+balance changed, or a daily challenge was completed. /events streams a
+user's events to the browser as server-sent events, so the garden no
+longer polls /plants, /stats, /credits and /challenges to find out.
+
+Every event has an id "<epoch>-<seq>" with seq increasing per user. The
+last EVENTS_BUFFER events per user are kept so a reconnecting client
+(EventSource sends Last-Event-ID automatically) gets exactly what it
+missed. If it asks for something older than the buffer, or from before
+this process started (a different epoch), it gets a single "resync"
+event and should reload its state.
+
+Waiting subscribers block on a Condition and hold no other state, so
+they cost nothing while idle. gunicorn.conf.py serves the app on a
+gevent worker, so each open stream is a greenlet rather than a thread. Streams also end after
+EVENTS_STREAM_SECONDS and the browser reconnects with Last-Event-ID,
+which bounds how long a plain threaded server holds a thread.
+
+Events live in process memory, like the leaderboard index: a client only
+sees events published by the worker process it is connected to.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER", "100"))
+MAX_USERS = int(os.getenv("EVENTS_MAX_USERS", "10000"))
+STREAM_SECONDS = int(os.getenv("EVENTS_STREAM_SECONDS", "300"))
+HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+RETRY_MS = 3000
+
+PLANT_CREATED = "plant-created"
+ACHIEVEMENT_AWARDED = "achievement-awarded"
+CREDITS_CHANGED = "credits-changed"
+CHALLENGE_COMPLETED = "challenge-completed"
+RESYNC = "resync"
+
+
+class _Channel:
+    """One user's recent events and the subscribers waiting for more"""
+
+    def __init__(self, lock):
+        self.seq = 0
+        self.events = deque(maxlen=BUFFER_SIZE)
+        self.changed = threading.Condition(lock)
+        self.subscribers = 0
+
+
+class EventHub:
+    """Buffers each user's recent events and wakes their subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = OrderedDict()
+        self.epoch = format(int(time.time()), "x")
+        self.published = 0
+
+    def _channel(self, user_id):
+        channel = self._channels.get(user_id)
+        if channel is None:
+            channel = self._channels[user_id] = _Channel(self._lock)
+            self._prune()
+        self._channels.move_to_end(user_id)
+        return channel
+
+    def _prune(self):
+        # Forget the least recently active users nobody is listening to
+        for user_id in list(self._channels):
+            if len(self._channels) <= MAX_USERS:
+                break
+            if not self._channels[user_id].subscribers:
+                del self._channels[user_id]
+
+    def publish(self, user_id, event_type, data):
+        """Record an event for a user and wake anyone streaming it"""
+        with self._lock:
+            channel = self._channel(user_id)
+            channel.seq += 1
+            channel.events.append((channel.seq, event_type, data))
+            self.published += 1
+            channel.changed.notify_all()
+        return f"{self.epoch}-{channel.seq}"
+
+    def parse_event_id(self, event_id):
+        """The seq in a Last-Event-ID, or None if it is not from this process"""
+        epoch, _, seq = (event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def resume_point(self, user_id, last_event_id):
+        """(seq to stream after, whether the client must resync)"""
+        with self._lock:
+            channel = self._channel(user_id)
+            if not last_event_id:
+                return channel.seq, False
+            seq = self.parse_event_id(last_event_id)
+            oldest = channel.events[0][0] if channel.events else channel.seq + 1
+            if seq is None or seq > channel.seq or seq < oldest - 1:
+                return channel.seq, True
+            return seq, False
+
+    def wait(self, user_id, after_seq, timeout):
+        """Events after `after_seq`, waiting up to `timeout` for one"""
+        with self._lock:
+            channel = self._channel(user_id)
+            channel.subscribers += 1
+            try:
+                if channel.seq <= after_seq:
+                    channel.changed.wait(timeout)
+                return [event for event in channel.events if event[0] > after_seq]
+            finally:
+                channel.subscribers -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._channels),
+                "subscribers": sum(c.subscribers for c in self._channels.values()),
+                "published": self.published,
+            }
+
+
+def format_event(event_id, event_type, data):
+    """One server-sent event"""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream(hub, user_id, last_event_id=None):
+    """Generate the SSE body for one connection"""
+    after_seq, resync = hub.resume_point(user_id, last_event_id)
+    yield f"retry: {RETRY_MS}\n\n"
+    if resync:
+        yield format_event(f"{hub.epoch}-{after_seq}", RESYNC, {})
+
+    deadline = time.monotonic() + STREAM_SECONDS
+    while time.monotonic() < deadline:
+        events = hub.wait(user_id, after_seq, HEARTBEAT_SECONDS)
+        if not events:
+            # Comment line keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            continue
+        for seq, event_type, data in events:
+            yield format_event(f"{hub.epoch}-{seq}", event_type, data)
+            after_seq = seq
+
+
+# Process-wide hub used by the app
+hub = EventHub()
+
+
+def publish(user_id, event_type, data):
+    return hub.publish(user_id, event_type, data)
@@ -0,0 +1,22 @@
+"""Gunicorn settings for Virtual Doodle Garden
+
+    gunicorn app:app      # picks this file up from the working directory
+
+Open /events streams spend most of their life waiting, so the app runs
+on a gevent worker: each connection is a greenlet, not a thread, and
+thousands of idle streams fit in one process. There is one worker by
+default because garden events, /events tickets and the leaderboard index
+live in process memory (a client only sees what its own worker wrote).
+Doodle analysis still runs in its own process pool (doodle_pool.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gevent"
+workers = int(os.getenv("WEB_WORKERS", "1"))
+# Open connections per worker, idle event streams included
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", "2000"))
+# Event streams outlive any request timeout; gevent workers only use this
+# for the worker heartbeat
+timeout = 30
+graceful_timeout = 10
@@ -0,0 +1,189 @@
+"""Precomputed leaderboard for Virtual Doodle Garden
+
+Keeps every gardener's plant, achievement, streak and credit scores in
+ranked structures so /leaderboard reads the top k of each board in O(k)
+instead of downloading every plant and achievement row and running one
+streak query per user.
+
+The index is updated in place when plants and achievements are written
+(record_plants / record_achievements). Each worker process holds its own
+index, so it is fully rebuilt from `user_stats` and `user_achievements`
+every LEADERBOARD_REBUILD_SECONDS and at UTC day rollover (when streaks
+expire) to pick up other workers' writes and correct any drift.
+
+Credit score keeps the original leaderboard formula:
+plants x 10 + achievements x 25 + streak x 5.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+import storage
+from user_stats import current_streak
+
+log = logging.getLogger(__name__)
+
+REBUILD_SECONDS = int(os.getenv("LEADERBOARD_REBUILD_SECONDS", "300"))
+TOP_K = 10
+
+
+def credit_score(entry):
+    return entry["plants"] * 10 + entry["achievements"] * 25 + entry["streak"] * 5
+
+
+# Board name -> (score function, label format)
+BOARDS = {
+    "by_plants": (lambda e: e["plants"], "{} 🌱"),
+    "by_credits": (credit_score, "{} 💰"),
+    "by_streaks": (lambda e: e["streak"], "{}🔥"),
+}
+
+
+class RankedBoard:
+    """Scores kept sorted (highest first, ties by user id)"""
+
+    def __init__(self):
+        self._scores = {}
+        self._order = []
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, user_id))]
+        self._scores[user_id] = score
+        insort(self._order, (-score, user_id))
+
+    def top(self, k):
+        return [(user_id, -neg_score) for neg_score, user_id in self._order[:k]]
+
+    def __len__(self):
+        return len(self._order)
+
+
+class LeaderboardIndex:
+    """Per-user scores plus one RankedBoard per leaderboard"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._boards = {name: RankedBoard() for name in BOARDS}
+        self.built_at = None
+        self.built_day = None
+
+    def _entry(self, user_id):
+        return self._entries.setdefault(
+            user_id, {"plants": 0, "achievements": 0, "streak": 0})
+
+    def _rank(self, user_id):
+        entry = self._entries[user_id]
+        for name, (score, _) in BOARDS.items():
+            self._boards[name].set(user_id, score(entry))
+
+    def record_plants(self, user_id, total_plants, streak):
+        """A user's plant count and streak after they created plants"""
+        with self._lock:
+            entry = self._entry(user_id)
+            entry["plants"] = total_plants
+            entry["streak"] = streak
+            self._rank(user_id)
+
+    def record_achievements(self, user_id, count):
+        """A user was awarded `count` new achievements"""
+        with self._lock:
+            self._entry(user_id)["achievements"] += count
+            self._rank(user_id)
+
+    def load(self, entries):
+        """Replace the whole index with freshly computed entries"""
+        boards = {name: RankedBoard() for name in BOARDS}
+        for user_id, entry in entries.items():
+            for name, (score, _) in BOARDS.items():
+                boards[name].set(user_id, score(entry))
+        with self._lock:
+            self._entries = entries
+            self._boards = boards
+            self.built_at = time.monotonic()
+            self.built_day = datetime.utcnow().date()
+
+    def is_stale(self):
+        return (self.built_at is None
+                or time.monotonic() - self.built_at > REBUILD_SECONDS
+                or self.built_day != datetime.utcnow().date())
+
+    def payload(self, k=TOP_K):
+        """The /leaderboard response body"""
+        with self._lock:
+            tops = {name: self._boards[name].top(k) for name in BOARDS}
+        return {
+            name: [
+                {
+                    "rank": i + 1,
+                    "user_id": user_id,
+                    "value": value,
+                    "label": BOARDS[name][1].format(value)
+                }
+                for i, (user_id, value) in enumerate(tops[name])
+            ]
+            for name in BOARDS
+        }
+
+
+def load_entries(sb):
+    """Compute every user's scores with two bulk reads (paged past the
+    API's row cap)"""
+    entries = {}
+
+    def entry(user_id):
+        return entries.setdefault(
+            user_id, {"plants": 0, "achievements": 0, "streak": 0})
+
+    try:
+        stats_rows = storage.fetch_all(lambda: sb.table("user_stats").select(
+            "user_id, total_drawings, current_streak, last_draw_date").order("user_id"))
+        for row in stats_rows:
+            user_entry = entry(row["user_id"])
+            user_entry["plants"] = row.get("total_drawings") or 0
+            user_entry["streak"] = current_streak(row)
+    except Exception as e:
+        log.error("Error loading user stats for leaderboard: %s", e)
+
+    try:
+        achievement_rows = storage.fetch_all(lambda: sb.table("user_achievements").select(
+            "user_id").order("id"))
+        for row in achievement_rows:
+            entry(row["user_id"])["achievements"] += 1
+    except Exception as e:
+        log.error("Error loading achievements for leaderboard: %s", e)
+
+    return entries
+
+
+# Process-wide index used by the app
+index = LeaderboardIndex()
+_rebuild_lock = threading.Lock()
+
+
+def rebuild(sb):
+    """Full rebuild of the process-wide index from the database"""
+    with _rebuild_lock:
+        index.load(load_entries(sb))
+
+
+def ensure_fresh(sb):
+    """Rebuild the index if it is missing, too old, or from another UTC day"""
+    if index.is_stale():
+        with _rebuild_lock:
+            if index.is_stale():
+                index.load(load_entries(sb))
+
+
+def record_plants(user_id, total_plants, streak):
+    index.record_plants(user_id, total_plants, streak)
+
+
+def record_achievements(user_id, count):
+    index.record_achievements(user_id, count)
@@ -0,0 +1,176 @@
+"""Logging for Virtual Doodle Garden
+
+Modules log through `logging.getLogger(__name__)` with %-style arguments
+(`log.info("Plant %s created", plant_id)`), never f-strings, so messages
+below the configured level are never formatted.
+
+configure() puts a single QueueHandler on the root logger. The request
+thread only stamps the record with the current request ID and appends it
+to a bounded queue; a QueueListener thread formats it (including any
+traceback) and writes it to stderr. If the queue is full the record is
+dropped and counted rather than blocking the request. Because formatting
+happens later on the listener thread, log values rather than objects you
+are about to mutate.
+
+Each request gets an ID, taken from a well-formed X-Request-ID header or
+generated, which is logged with every record and echoed in the response.
+The ID lives in a ContextVar, so work fanned out with a copied context
+(fanout.py) logs under the same ID.
+
+Environment:
+    LOG_LEVEL       root level (default INFO)
+    LOG_LEVELS      per-module overrides, e.g. "achievements=DEBUG,auth=WARNING"
+    LOG_FORMAT      "text" (default) or "json" (one object per line)
+    LOG_QUEUE_SIZE  records that may wait for the writer (default 10000)
+    LOG_PAYLOADS    "1" logs full plant payloads and database responses
+                    (the "app.payloads" logger); off by default
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+PAYLOAD_LOGGER = "app.payloads"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_request_id = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_handler = None
+_listener = None
+
+
+def set_request_id(request_id=None):
+    """Start logging under `request_id` (or a new one); returns (id, reset token)"""
+    if not request_id or not _REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    return request_id, _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS and not key.startswith("_")}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request ID of the thread that logged them"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueue records unformatted; drop them if the writer falls behind"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener formats the record, so the caller pays for neither
+        # %-formatting nor traceback rendering
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """TEXT_FORMAT followed by any extra fields as key=value"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure():
+    """Route all logging through the queue (safe to call more than once).
+
+    Settings are read from the environment now, so call this after
+    load_dotenv().
+    """
+    global _handler, _listener
+    if _listener is not None:
+        return
+
+    writer = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "text") == "json":
+        writer.setFormatter(JsonFormatter())
+    else:
+        writer.setFormatter(TextFormatter(TEXT_FORMAT))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    _handler.addFilter(RequestIdFilter())
+    _listener = QueueListener(_handler.queue, writer)
+    _listener.start()
+    atexit.register(shutdown)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    payloads = os.getenv("LOG_PAYLOADS", "0") == "1"
+    logging.getLogger(PAYLOAD_LOGGER).setLevel(logging.DEBUG if payloads else logging.WARNING)
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def stats():
+    return {"queued": _handler.queue.qsize() if _handler else 0,
+            "dropped": _handler.dropped if _handler else 0}
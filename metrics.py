@@ -0,0 +1,218 @@
+"""Prometheus metrics for Virtual Doodle Garden
+
+GET /metrics returns everything below in the Prometheus text format:
+
+    garden_http_request_duration_seconds{endpoint,method}   histogram
+    garden_http_responses_total{endpoint,method,status}      counter
+    garden_http_request_errors_total{endpoint,method}        counter (5xx)
+    garden_http_requests_in_flight{endpoint}                 gauge
+    garden_db_query_duration_seconds{table,operation}       histogram
+    garden_db_query_errors_total{table,operation}           counter
+    garden_query_cache_reads_total{result}                   counter
+    garden_doodle_stage_duration_seconds{stage,format}      histogram
+
+plus gauges read at scrape time from the stats() of the event hub, claim
+cache, leaderboard cache and doodle pool (see `add_stats`), e.g.
+garden_event_stream_subscribers.
+
+Database functions called with rpc() are labelled table="rpc",
+operation=<function name>.
+
+Endpoints are labelled by URL rule (e.g. "/plants"), not by path, so the
+number of series stays fixed. Recording is a dict lookup and a few
+additions under one lock per metric; set METRICS_ENABLED=0 to skip it
+entirely. Metrics are per worker process, like the leaderboard index.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds; covers cache hits (sub-millisecond) up to slow Supabase calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        lines = self.header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} "
+                         f"{_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics plus stats dicts that are reported as gauges at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats(self, prefix, documentation, stats):
+        """Report each numeric value of `stats()` as gauge <prefix>_<key>"""
+        self._stats.append((prefix, documentation, stats))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for prefix, documentation, stats in self._stats:
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines += [f"# HELP {name} {documentation} ({key})",
+                          f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "garden_http_request_duration_seconds", "Time to produce a response",
+    ("endpoint", "method")))
+RESPONSES = registry.register(Counter(
+    "garden_http_responses_total", "Responses sent", ("endpoint", "method", "status")))
+REQUEST_ERRORS = registry.register(Counter(
+    "garden_http_request_errors_total", "Responses with a 5xx status",
+    ("endpoint", "method")))
+IN_FLIGHT = registry.register(Gauge(
+    "garden_http_requests_in_flight", "Requests being handled", ("endpoint",)))
+QUERY_SECONDS = registry.register(Histogram(
+    "garden_db_query_duration_seconds", "Database round trips by table and operation",
+    ("table", "operation")))
+QUERY_ERRORS = registry.register(Counter(
+    "garden_db_query_errors_total", "Database calls that raised", ("table", "operation")))
+QUERY_CACHE_READS = registry.register(Counter(
+    "garden_query_cache_reads_total", "Request-scoped read cache lookups", ("result",)))
+DOODLE_SECONDS = registry.register(Histogram(
+    "garden_doodle_stage_duration_seconds", "Doodle decoding and analysis time",
+    ("stage", "format")))
+
+
+def add_stats(prefix, documentation, stats):
+    registry.add_stats(prefix, documentation, stats)
+
+
+def observe_request(endpoint, method, status, seconds):
+    if not ENABLED:
+        return
+    REQUEST_SECONDS.observe(seconds, endpoint, method)
+    RESPONSES.inc(endpoint, method, str(status))
+    if status >= 500:
+        REQUEST_ERRORS.inc(endpoint, method)
+
+
+def observe_query(table, operation, seconds, failed=False):
+    if not ENABLED:
+        return
+    QUERY_SECONDS.observe(seconds, table, operation)
+    if failed:
+        QUERY_ERRORS.inc(table, operation)
+
+
+def observe_doodle(features):
+    """Record the stage timings analyze_image_file attached to `features`"""
+    if not ENABLED:
+        return
+    image_format = features.get("format") or "unknown"
+    for stage, seconds in (features.get("timings") or {}).items():
+        DOODLE_SECONDS.observe(seconds, stage, image_format)
+
+
+def render():
+    return registry.render()
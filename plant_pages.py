@@ -0,0 +1,170 @@
+"""Keyset pagination for /plants
+
+Plants are listed newest first, ordered by (created_at, id) descending.
+A page ends with an opaque cursor naming its last plant; the next page
+asks for plants strictly older than that (created_at, id) pair, so the
+database seeks straight to it instead of skipping OFFSET rows. Plants
+inserted while a client is paging are newer than every cursor already
+handed out, so they never shift or duplicate later pages.
+
+`fields` limits the columns returned, e.g. the garden only needs
+"height,branches,leaf_type,color,growth_stage". id and created_at are
+always included because the cursor is built from them.
+
+Polling clients use a watermark instead: the same (created_at, id) pair
+for the newest plant they have seen. `fetch_since` returns only plants
+after it, oldest first, together with the new watermark and the plant
+count. created_at is set when the inserting transaction starts, not when
+it commits, so a plant whose insert commits just after a poll can sort
+behind the watermark that poll returned and is never returned by
+`since`. No insert-time key (a sequence, clock_timestamp()) is ordered
+by commit either. Clients reconcile against the count instead: if
+`total` grew by more than the plants `since` returned, they reload the
+first page. Plants are
+never updated or deleted, so the newest plant and the plant count
+(`garden_version`) identify the whole garden; that is what the /plants
+ETag and Last-Modified are derived from.
+"""
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime
+
+PAGE_SIZE = int(os.getenv("PLANTS_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("PLANTS_MAX_PAGE_SIZE", "200"))
+
+PLANT_FIELDS = ("id", "user_id", "height", "branches", "leaf_type", "color",
+                "growth_stage", "created_at")
+CURSOR_FIELDS = ("id", "created_at")
+
+
+class InvalidPageRequest(ValueError):
+    """A bad cursor, limit or fields parameter"""
+
+
+def encode_cursor(plant):
+    """Opaque cursor pointing just past `plant`"""
+    raw = json.dumps([plant["created_at"], plant["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor made by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, plant_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(created_at, str) or not isinstance(plant_id, str):
+            raise ValueError
+        return created_at, plant_id
+    except (ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def parse_fields(fields):
+    """Column list for select() from a comma separated `fields` parameter"""
+    if not fields:
+        return "*"
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PLANT_FIELDS]
+    if unknown:
+        raise InvalidPageRequest(f"Unknown fields: {', '.join(unknown)}")
+    columns = list(CURSOR_FIELDS)
+    columns += [field for field in requested if field not in columns]
+    return ", ".join(columns)
+
+
+def parse_limit(limit):
+    """Page size from the `limit` parameter, capped at MAX_PAGE_SIZE"""
+    if limit is None or limit == "":
+        return PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidPageRequest("limit must be an integer")
+    if limit < 1:
+        raise InvalidPageRequest("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _after(created_at, plant_id, op):
+    """Keyset filter for plants before ("lt") or after ("gt") a cursor"""
+    return (f"created_at.{op}.{_quote(created_at)},"
+            f"and(created_at.eq.{_quote(created_at)},id.{op}.{_quote(plant_id)})")
+
+
+def _quote(value):
+    # PostgREST filter values containing reserved characters must be quoted
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def fetch_page(sb, user_id, columns="*", limit=PAGE_SIZE, cursor=None):
+    """One page of a user's plants, newest first.
+
+    Returns (plants, next_cursor); next_cursor is None on the last page.
+    """
+    query = sb.table("plants").select(columns).eq("user_id", user_id)
+    if cursor:
+        created_at, plant_id = decode_cursor(cursor)
+        query = query.or_(_after(created_at, plant_id, "lt"))
+
+    # One extra row tells us whether another page follows
+    response = query.order("created_at", desc=True).order(
+        "id", desc=True).limit(limit + 1).execute()
+    plants = response.data or []
+
+    next_cursor = None
+    if len(plants) > limit:
+        plants = plants[:limit]
+        next_cursor = encode_cursor(plants[-1])
+    return plants, next_cursor
+
+
+def fetch_since(sb, user_id, columns="*", since=None, limit=MAX_PAGE_SIZE):
+    """Plants created after the `since` watermark, oldest first.
+
+    An empty watermark means "from the beginning". Returns
+    (plants, watermark, has_more); the watermark is unchanged when there
+    is nothing new, and has_more means another call will return more.
+    A plant committed late can sort behind a watermark already handed out
+    (see the module docstring), so callers check the plant count too.
+    """
+    query = sb.table("plants").select(columns).eq("user_id", user_id)
+    if since:
+        created_at, plant_id = decode_cursor(since)
+        query = query.or_(_after(created_at, plant_id, "gt"))
+
+    response = query.order("created_at").order("id").limit(limit + 1).execute()
+    plants = response.data or []
+
+    has_more = len(plants) > limit
+    plants = plants[:limit]
+    watermark = encode_cursor(plants[-1]) if plants else (since or None)
+    return plants, watermark, has_more
+
+
+def garden_version(sb, user_id):
+    """(plant count, newest plant) for a user, in one small read.
+
+    The newest plant holds only id and created_at, or is None for an
+    empty garden.
+    """
+    response = sb.table("plants").select("id, created_at", count="exact").eq(
+        "user_id", user_id).order("created_at", desc=True).order(
+        "id", desc=True).limit(1).execute()
+    newest = response.data[0] if response.data else None
+    total = response.count if response.count is not None else len(response.data or [])
+    return total, newest
+
+
+def version_etag(user_id, total, newest, variant=""):
+    """ETag for a view (`variant`, e.g. the query string) of a garden"""
+    key = f"{user_id}|{total}|{newest['id'] if newest else ''}|{variant}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def last_modified(newest):
+    """Creation time of the newest plant, for Last-Modified"""
+    if not newest:
+        return None
+    return datetime.fromisoformat(newest["created_at"].replace("Z", "+00:00"))
@@ -0,0 +1,224 @@
+"""Request-scoped memoization of Supabase reads
+
+A single request often issues the same read more than once (e.g. /stats
+loads achievements while awarding them and again for the response).
+CachedClient wraps the Supabase client so identical table/filter reads
+within one request hit the network once:
+
+    supabase = CachedClient(create_client(url, key))
+    supabase.table("plants").select("*").eq("user_id", uid).execute()
+
+Reads are keyed by table plus the exact builder call chain. Any insert,
+upsert, update or delete on a table drops that table's cached reads;
+an rpc() call may write any table, so it drops them all.
+When threads of one request issue the same read at the same moment,
+only the first goes to the network; the others wait for its result.
+Callers may modify what they get back, so cached rows are copied in and
+out. Reads returning more than QUERY_CACHE_MAX_ROWS rows are not kept,
+because copying them costs more than the read they would save.
+Outside a request scope (begin_request/end_request) every call passes
+straight through. The scope lives in a ContextVar, so work fanned out to
+threads with a copied context shares the request's cache.
+"""
+import copy
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+import metrics
+
+WRITE_METHODS = {"insert", "upsert", "update", "delete"}
+MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", "500"))
+
+_scope = ContextVar("query_cache_scope", default=None)
+
+
+class CachedResponse:
+    """Stand-in for a Supabase response served from the cache"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class RequestCache:
+    """Cached reads and hit/miss counters for one request"""
+
+    def __init__(self):
+        self.entries = {}
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """The cached response, or None if the caller must run the read.
+
+        A None return claims the read: later callers for the same key
+        wait until put() or release() instead of running it again.
+        """
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    break
+                pending = self.in_flight.get(key)
+                if pending is None:
+                    self.in_flight[key] = threading.Event()
+                    self.misses += 1
+                    return None
+            pending.wait()
+        data, count = entry
+        return CachedResponse(copy.deepcopy(data), count)
+
+    def put(self, key, response):
+        data = getattr(response, "data", None)
+        if isinstance(data, list) and len(data) > MAX_ROWS:
+            self.release(key)
+            return
+        entry = (copy.deepcopy(data), getattr(response, "count", None))
+        with self.lock:
+            self.entries[key] = entry
+        self.release(key)
+
+    def release(self, key):
+        """Wake readers waiting on a claimed read (e.g. after it failed)"""
+        with self.lock:
+            pending = self.in_flight.pop(key, None)
+        if pending is not None:
+            pending.set()
+
+    def invalidate(self, table=None):
+        """Drop the cached reads of `table` (of every table if None)"""
+        with self.lock:
+            stale = [key for key in self.entries if table is None or key[0] == table]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "invalidations": self.invalidations}
+
+
+def begin_request():
+    """Open a cache scope for the current request; returns a reset token"""
+    return _scope.set(RequestCache())
+
+
+def end_request(token=None):
+    """Close the current request's cache scope"""
+    if token is not None:
+        _scope.reset(token)
+    else:
+        _scope.set(None)
+
+
+def current_stats():
+    """Hit/miss counters for the current request, or None outside one"""
+    scope = _scope.get()
+    return scope.stats() if scope else None
+
+
+class _RecordedQuery:
+    """Records a query builder chain and replays it on execute()"""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return record
+
+    def execute(self):
+        return self._client._execute(self._table, self._calls)
+
+
+class _RecordedCall:
+    """An rpc() call, run on execute()"""
+
+    def __init__(self, client, name, params):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        return self._client._call(self._name, self._params)
+
+
+class CachedClient:
+    """Supabase client wrapper that memoizes reads per request"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def table(self, name):
+        return _RecordedQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return _RecordedCall(self, name, params or {})
+
+    def _call(self, name, params):
+        scope = _scope.get()
+        if scope is not None:
+            scope.invalidate()
+        started = time.perf_counter()
+        try:
+            response = self._client.rpc(name, params).execute()
+        except Exception:
+            metrics.observe_query("rpc", name, time.perf_counter() - started, failed=True)
+            raise
+        finally:
+            if scope is not None:
+                scope.invalidate()
+        metrics.observe_query("rpc", name, time.perf_counter() - started)
+        return response
+
+    def _run(self, table, calls):
+        operation = next((name for name, _, _ in calls
+                          if name in WRITE_METHODS or name == "select"), "select")
+        started = time.perf_counter()
+        try:
+            builder = self._client.table(table)
+            for name, args, kwargs in calls:
+                builder = getattr(builder, name)(*args, **kwargs)
+            response = builder.execute()
+        except Exception:
+            metrics.observe_query(table, operation, time.perf_counter() - started, failed=True)
+            raise
+        metrics.observe_query(table, operation, time.perf_counter() - started)
+        return response
+
+    def _execute(self, table, calls):
+        scope = _scope.get()
+        if scope is None:
+            return self._run(table, calls)
+
+        if any(name in WRITE_METHODS for name, _, _ in calls):
+            scope.invalidate(table)
+            try:
+                return self._run(table, calls)
+            finally:
+                scope.invalidate(table)
+
+        key = (table, repr(calls))
+        cached = scope.get(key)
+        if cached is not None:
+            return cached
+        try:
+            response = self._run(table, calls)
+        except Exception:
+            scope.release(key)
+            raise
+        scope.put(key, response)
+        return response
@@ -0,0 +1,101 @@
+"""Shared response cache with stale-while-revalidate
+
+For public responses that are identical for every caller (the
+leaderboard). The rendered body is kept with a strong ETag for `ttl`
+seconds. After that the stale body keeps being served while exactly one
+background thread rebuilds it, so an expiry never sends a burst of
+requests to the database at once.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class SharedResponseCache:
+    """Caches the bytes returned by `build()` for `ttl` seconds"""
+
+    def __init__(self, build, ttl):
+        self._build = build
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._body = None
+        self._etag = None
+        self._built_at = 0.0
+        self._refreshing = False
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_ms = None
+        self.total_refresh_ms = 0.0
+
+    def _refresh(self):
+        start = time.perf_counter()
+        try:
+            body = self._build()
+        except Exception as e:
+            self.refresh_errors += 1
+            log.error("Error refreshing cached response: %s", e)
+            return False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._body = body
+            self._etag = hashlib.sha1(body).hexdigest()[:16]
+            self._built_at = time.monotonic()
+            self.refreshes += 1
+            self.last_refresh_ms = round(elapsed_ms, 1)
+            self.total_refresh_ms += elapsed_ms
+        return True
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """Return (body, etag, state) where state is HIT, STALE or MISS"""
+        with self._lock:
+            body, etag = self._body, self._etag
+            if body is not None:
+                if time.monotonic() - self._built_at < self.ttl:
+                    self.hits += 1
+                    return body, etag, "HIT"
+                self.stale_hits += 1
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background,
+                                     daemon=True).start()
+                return body, etag, "STALE"
+
+        # Nothing cached yet: build synchronously, one request at a time
+        with self._build_lock:
+            with self._lock:
+                if self._body is not None:
+                    self.hits += 1
+                    return self._body, self._etag, "HIT"
+                self.misses += 1
+            if not self._refresh():
+                raise RuntimeError("Could not build response")
+            with self._lock:
+                return self._body, self._etag, "MISS"
+
+    def stats(self):
+        served = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / served, 4) if served else None,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_refresh_ms": self.last_refresh_ms,
+            "avg_refresh_ms": round(self.total_refresh_ms / self.refreshes, 1) if self.refreshes else None,
+        }
@@ -408,7 +408,8 @@ clearBtn.addEventListener('click', () => {
 
 // ========== PLANT BUTTON & SUBMISSION ========== 
 plantBtn.addEventListener('click', async () => {
-    const imageData = canvas.toDataURL('image/png');
+    // Send the PNG as a raw binary body (no base64 / JSON wrapping)
+    const imageBlob = await new Promise(resolve => canvas.toBlob(resolve, 'image/png'));
 
     loadingSpinner.classList.remove('hidden');
     errorMessage.classList.add('hidden');
@@ -423,10 +424,10 @@ plantBtn.addEventListener('click', async () => {
         const response = await fetch('/generate', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
+                'Content-Type': 'image/png',
                 'Authorization': `Bearer ${token}`
             },
-            body: JSON.stringify({ image: imageData })
+            body: imageBlob
         });
 
         if (response.ok) {
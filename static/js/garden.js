@@ -38,6 +38,16 @@ const startHeightChallengeBtn = document.getElementById('startHeightChallengeBtn
 const cancelHeightChallengeBtn = document.getElementById('cancelHeightChallengeBtn');
 
 let currentPlants = [];
+let totalPlantCount = 0;
+let nextPlantCursor = null;
+let loadingMorePlants = false;
+let gardenWatermark = null;
+// Plants accounted for since the garden was loaded (checked against `total`)
+let gardenPlantTotal = 0;
+let gardenLoaded = false;
+let currentChallenges = [];
+let gardenEvents = null;
+let lastGardenEventId = null;
 let isSortedByHeight = false;
 let currentCredits = 0;
 let userCosmetics = {};
@@ -47,6 +57,7 @@ let localSpentCosmetics = JSON.parse(localStorage.getItem('localSpentCosmetics')
 let speedDrawActive = false;
 let speedDrawCount = 0;
 let speedDrawInterval = null;
+let speedDrawWatermark = null;
 let colorMatchActive = false;
 let colorMatchSequence = [];
 let playerSequence = [];
@@ -213,6 +224,99 @@ if (challengeBtn) {
 // ========== FETCH & DISPLAY PLANTS ========== 
 let previousAchievementCount = 0;
 
+// The garden only needs these columns; the rest of each plant row is skipped
+const PLANT_FIELDS = 'height,branches,leaf_type,color,growth_stage';
+const PLANT_PAGE_SIZE = 60;
+
+async function fetchPlantPage(cursor) {
+    const params = new URLSearchParams({ fields: PLANT_FIELDS, limit: PLANT_PAGE_SIZE });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    const response = await fetch(`/plants?${params}`, {
+        headers: {
+            'Authorization': `Bearer ${await getAuthToken()}`
+        }
+    });
+    if (!response.ok) {
+        throw new Error('Failed to fetch plants');
+    }
+    return response.json();
+}
+
+// Plants created after the watermark, oldest first (a near-empty response
+// when nothing changed)
+async function fetchNewPlants(since, fields) {
+    const params = new URLSearchParams({ fields: fields, since: since || '' });
+    const response = await fetch(`/plants?${params}`, {
+        headers: {
+            'Authorization': `Bearer ${await getAuthToken()}`
+        }
+    });
+    if (!response.ok) {
+        throw new Error('Failed to fetch new plants');
+    }
+    return response.json();
+}
+
+// Fetch the next page once the bottom of the garden scrolls into view
+const plantPageSentinel = document.createElement('div');
+gardenGrid.after(plantPageSentinel);
+const plantPageObserver = new IntersectionObserver(entries => {
+    if (entries.some(entry => entry.isIntersecting)) {
+        loadMorePlants();
+    }
+}, { rootMargin: '400px' });
+
+async function loadMorePlants() {
+    if (!nextPlantCursor || loadingMorePlants) {
+        return;
+    }
+    loadingMorePlants = true;
+    try {
+        const page = await fetchPlantPage(nextPlantCursor);
+        nextPlantCursor = page.next_cursor;
+        currentPlants = currentPlants.concat(page.plants);
+        renderPlants(page.plants);
+        loadingMorePlants = false;
+        watchForMorePlants();
+    } catch (e) {
+        console.error('Error loading more plants:', e);
+        loadingMorePlants = false;
+    }
+}
+
+// Re-observing reports the sentinel's current visibility, so a page too
+// short to fill the screen still pulls in the next one
+function watchForMorePlants() {
+    plantPageObserver.unobserve(plantPageSentinel);
+    if (nextPlantCursor) {
+        plantPageObserver.observe(plantPageSentinel);
+    }
+}
+
+function updateGardenStats(stats) {
+    totalPlantCount = stats.total_plants;
+    document.getElementById('totalPlants').textContent = stats.total_plants;
+    if (stats.total_plants > 0) {
+        document.getElementById('tallestPlant').textContent = stats.tallest_plant + 'px';
+        document.getElementById('colorVariety').textContent = stats.unique_colors;
+        document.getElementById('leafTypes').textContent = stats.unique_leaf_types;
+
+        // Update height challenge bar if active
+        if (heightChallengeActive && heightBar) {
+            const maxHeight = stats.tallest_plant;
+            const percentage = Math.min((maxHeight / 350) * 100, 100);
+            heightBar.style.height = percentage + '%';
+            document.getElementById('currentHeight').textContent = maxHeight;
+
+            if (maxHeight >= 350) {
+                completeHeightChallenge();
+            }
+        }
+    }
+}
+
 async function loadGarden() {
     try {
         // Get auth token
@@ -221,157 +325,127 @@ async function loadGarden() {
             throw new Error('Not authenticated');
         }
 
-        const response = await fetch('/plants', {
+        // One request returns plants, stats, credits, challenges and
+        // cosmetics. Once the garden is on screen only plants created
+        // since the last load are fetched; otherwise the first page is,
+        // and the rest follows as the user scrolls.
+        const params = new URLSearchParams({ fields: PLANT_FIELDS, limit: PLANT_PAGE_SIZE });
+        if (gardenLoaded) {
+            params.set('since', gardenWatermark || '');
+        }
+        const response = await fetch(`/garden/bootstrap?${params}`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
         });
-
         if (!response.ok) {
+            throw new Error('Failed to fetch garden');
+        }
+        const data = await response.json();
+        if (!data.plants) {
             throw new Error('Failed to fetch plants');
         }
 
-        const plants = await response.json();
-        currentPlants = plants;
-        loadingSpinner.classList.add('hidden');
-
-        // Update stats
-        document.getElementById('totalPlants').textContent = plants.length;
-
-        if (plants.length > 0) {
-            const heights = plants.map(p => p.height);
-            const tallest = Math.max(...heights);
-            document.getElementById('tallestPlant').textContent = tallest + 'px';
-
-            const colors = new Set(plants.map(p => p.color));
-            document.getElementById('colorVariety').textContent = colors.size;
-
-            const leafTypes = new Set(plants.map(p => p.leaf_type));
-            document.getElementById('leafTypes').textContent = leafTypes.size;
-
-            // Update height challenge bar if active
-            if (heightChallengeActive && heightBar) {
-                const maxHeight = Math.max(...heights);
-                const percentage = Math.min((maxHeight / 350) * 100, 100);
-                heightBar.style.height = percentage + '%';
-                document.getElementById('currentHeight').textContent = maxHeight;
-
-                if (maxHeight >= 350) {
-                    completeHeightChallenge();
-                }
+        let page = null;
+        let newPlants = [];
+        if (gardenLoaded) {
+            let delta = data.plants;
+            newPlants = delta.plants;
+            while (delta.has_more) {
+                delta = await fetchNewPlants(delta.watermark, PLANT_FIELDS);
+                newPlants = newPlants.concat(delta.plants);
+            }
+            // A plant whose insert committed after an earlier poll can sort
+            // behind the watermark and never come back from `since`. If the
+            // count grew by more than we received, reload the first page.
+            if (data.plants.total > gardenPlantTotal + newPlants.length) {
+                gardenLoaded = false;
+                return loadGarden();
             }
+            gardenPlantTotal += newPlants.length;
+            gardenWatermark = delta.watermark;
+            // Skip plants the event stream already put on screen
+            const shownIds = new Set(currentPlants.map(plant => plant.id));
+            newPlants = newPlants.filter(plant => !shownIds.has(plant.id)).reverse();
+            currentPlants = newPlants.concat(currentPlants);
+        } else {
+            page = data.plants;
+            currentPlants = page.plants;
+            gardenWatermark = page.watermark;
+            gardenPlantTotal = page.total;
+            nextPlantCursor = null;
         }
+        const plants = currentPlants;
+        loadingSpinner.classList.add('hidden');
 
-        // Load achievements from stats endpoint
-        try {
-            const statsResponse = await fetch('/stats', {
-                headers: {
-                    'Authorization': `Bearer ${await getAuthToken()}`
-                }
-            });
-            if (statsResponse.ok) {
-                const stats = await statsResponse.json();
-                const currentCount = stats.achievements_count;
-                document.getElementById('achievements').textContent = currentCount;
-
-                // Show animation if new achievement unlocked
-                if (currentCount > previousAchievementCount) {
-                    showAchievementPopup(
-                        'Achievement Unlocked!',
-                        `You now have ${currentCount} achievements! 🌟`
-                    );
-                    previousAchievementCount = currentCount;
-                }
+        // Totals and achievements
+        if (data.stats) {
+            const stats = data.stats;
+            updateGardenStats(stats);
+            const currentCount = stats.achievements_count;
+            document.getElementById('achievements').textContent = currentCount;
+
+            // Show animation if new achievement unlocked
+            if (currentCount > previousAchievementCount) {
+                showAchievementPopup(
+                    'Achievement Unlocked!',
+                    `You now have ${currentCount} achievements! 🌟`
+                );
+                previousAchievementCount = currentCount;
             }
-        } catch (e) {
-            console.error('Error loading achievements:', e);
+        } else {
+            console.error('Error loading achievements');
         }
 
-        // Load credits
-        try {
-            const creditsResponse = await fetch('/credits', {
-                headers: {
-                    'Authorization': `Bearer ${await getAuthToken()}`
-                }
-            });
-            if (creditsResponse.ok) {
-                const creditsData = await creditsResponse.json();
-                currentCredits = creditsData.total_credits;
-                document.getElementById('credits').textContent = creditsData.total_credits;
-            } else {
-                const err = await creditsResponse.json().catch(() => ({}));
-                console.error('Credits error:', err);
-                document.getElementById('credits').textContent = currentCredits || 0;
-            }
-        } catch (e) {
-            console.error('Error loading credits:', e);
+        // Credits
+        if (data.credits) {
+            currentCredits = data.credits.total_credits;
+            document.getElementById('credits').textContent = data.credits.total_credits;
+        } else {
+            console.error('Error loading credits');
             document.getElementById('credits').textContent = currentCredits || 0;
         }
 
-        // Load challenges
-        try {
-            const challengesResponse = await fetch('/challenges', {
-                headers: {
-                    'Authorization': `Bearer ${await getAuthToken()}`
-                }
-            });
-            if (challengesResponse.ok) {
-                const challenges = await challengesResponse.json();
-                const challengeList = Array.isArray(challenges)
-                    ? challenges
-                    : (challenges.daily_challenges || []);
-                displayChallenges(challengeList);
-            }
-        } catch (e) {
-            console.error('Error loading challenges:', e);
+        // Challenges
+        if (data.challenges) {
+            currentChallenges = data.challenges.daily_challenges || [];
+            displayChallenges(currentChallenges);
+        } else {
+            console.error('Error loading challenges');
         }
 
-        // Load user cosmetics for plant rendering
-        try {
-            const cosmeticsResponse = await fetch('/cosmetics', {
-                headers: {
-                    'Authorization': `Bearer ${await getAuthToken()}`
+        // User cosmetics for plant rendering
+        if (data.cosmetics) {
+            userCosmetics = {};
+            data.cosmetics.forEach(cosmetic => {
+                if (cosmetic.owned) {
+                    userCosmetics[cosmetic.id] = cosmetic;
                 }
             });
-            if (cosmeticsResponse.ok) {
-                const data = await cosmeticsResponse.json();
-                userCosmetics = {};
-                (data.cosmetics || []).forEach(cosmetic => {
-                    if (cosmetic.owned) {
-                        userCosmetics[cosmetic.id] = cosmetic;
-                    }
-                });
-            }
-        } catch (e) {
-            console.error('Error loading cosmetics:', e);
+        } else {
+            console.error('Error loading cosmetics');
         }
 
         if (plants.length === 0) {
             emptyState.classList.remove('hidden');
         } else {
+            emptyState.classList.add('hidden');
             gardenGrid.classList.remove('hidden');
-            plants.forEach(plant => {
-                const plantCard = createPlantCard(plant);
-                gardenGrid.appendChild(plantCard);
-
-                // Check Height Challenge if active
-                if (heightChallengeActive && plant.height >= 350) {
-                    completeHeightChallenge();
-                }
-
-                // Update height bar display if Height Challenge is showing
-                if (heightChallengeActive) {
-                    const maxHeight = 350;
-                    const percentage = Math.min(100, (plant.height / maxHeight) * 100);
-                    if (heightBar) {
-                        heightBar.style.height = percentage + '%';
-                    }
-                    const heightDisplay = document.getElementById('currentHeight');
-                    if (heightDisplay) {
-                        heightDisplay.textContent = plant.height;
-                    }
-                }
-            });
+            if (page) {
+                gardenGrid.innerHTML = '';
+                renderPlants(plants);
+            } else {
+                // Newest first, ahead of the plants already shown
+                const firstCard = gardenGrid.firstChild;
+                newPlants.forEach(plant => {
+                    gardenGrid.insertBefore(createPlantCard(plant), firstCard);
+                });
+            }
+        }
+        if (page) {
+            nextPlantCursor = page.next_cursor;
+            gardenLoaded = true;
+            watchForMorePlants();
         }
 
     } catch (error) {
@@ -382,6 +456,31 @@ async function loadGarden() {
     }
 }
 
+function renderPlants(plants) {
+    plants.forEach(plant => {
+        const plantCard = createPlantCard(plant);
+        gardenGrid.appendChild(plantCard);
+
+        // Check Height Challenge if active
+        if (heightChallengeActive && plant.height >= 350) {
+            completeHeightChallenge();
+        }
+
+        // Update height bar display if Height Challenge is showing
+        if (heightChallengeActive) {
+            const maxHeight = 350;
+            const percentage = Math.min(100, (plant.height / maxHeight) * 100);
+            if (heightBar) {
+                heightBar.style.height = percentage + '%';
+            }
+            const heightDisplay = document.getElementById('currentHeight');
+            if (heightDisplay) {
+                heightDisplay.textContent = plant.height;
+            }
+        }
+    });
+}
+
 // ========== DISPLAY CHALLENGES ========== 
 function displayChallenges(challenges) {
     challengesList.innerHTML = '';
@@ -744,8 +843,9 @@ function startSpeedDraw() {
     let timeLeft = 60;
     speedDrawTimer.textContent = '60';
 
-    // Store initial plant count
-    const initialPlantCount = currentPlants.length;
+    // Store initial plant count; progress is polled from the current watermark
+    const initialPlantCount = totalPlantCount;
+    speedDrawWatermark = gardenWatermark;
     localStorage.setItem('speedDrawInitialCount', initialPlantCount);
     localStorage.setItem('speedDrawActive', 'true');
 
@@ -767,13 +867,12 @@ function startSpeedDraw() {
 
 async function checkSpeedDrawProgress(initialCount) {
     try {
-        // Get fresh plant data
-        const response = await fetch('/plants');
-        if (response.ok) {
-            const data = await response.json();
-            const newCount = Math.max(0, (data.plants?.length || 0) - initialCount);
-            updateSpeedDrawCounter(newCount);
-        }
+        // Only plants since the last check come back, so a poll with no new
+        // drawings is a near-empty response
+        const data = await fetchNewPlants(speedDrawWatermark, 'id');
+        speedDrawWatermark = data.watermark;
+        const newCount = Math.max(0, data.total - initialCount);
+        updateSpeedDrawCounter(newCount);
     } catch (e) {
         console.error('Error checking Speed Draw progress:', e);
     }
@@ -1177,7 +1276,90 @@ function playSound(soundName) {
     }
 }
 
+// ========== LIVE GARDEN EVENTS ==========
+// The server pushes plant, achievement, credit and challenge changes as
+// they are written, so the garden updates without refetching everything.
+async function connectGardenEvents() {
+    const token = await getAuthToken();
+    if (!token) {
+        return;
+    }
+    // EventSource cannot send headers, so trade the token for a single-use
+    // ticket rather than putting the token itself in the URL
+    let ticket;
+    try {
+        const response = await fetch('/events/ticket', {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        ({ ticket } = await response.json());
+    } catch (e) {
+        console.error('Error opening garden events:', e);
+        setTimeout(connectGardenEvents, 5000);
+        return;
+    }
+    const params = new URLSearchParams({ ticket });
+    if (lastGardenEventId) {
+        params.set('last_event_id', lastGardenEventId);
+    }
+    gardenEvents = new EventSource(`/events?${params}`);
+
+    const track = handler => event => {
+        lastGardenEventId = event.lastEventId || lastGardenEventId;
+        handler(JSON.parse(event.data));
+    };
+
+    gardenEvents.addEventListener('plant-created', track(({ plant, stats }) => {
+        if (gardenLoaded && !currentPlants.some(p => p.id === plant.id)) {
+            currentPlants.unshift(plant);
+            emptyState.classList.add('hidden');
+            gardenGrid.classList.remove('hidden');
+            gardenGrid.insertBefore(createPlantCard(plant), gardenGrid.firstChild);
+        }
+        if (stats) {
+            updateGardenStats(stats);
+        }
+    }));
+
+    gardenEvents.addEventListener('achievement-awarded', track(achievement => {
+        previousAchievementCount += 1;
+        document.getElementById('achievements').textContent = previousAchievementCount;
+        showAchievementPopup(
+            'Achievement Unlocked!',
+            `${achievement.emoji} ${achievement.name} 🌟`
+        );
+    }));
+
+    gardenEvents.addEventListener('credits-changed', track(({ total_credits }) => {
+        currentCredits = total_credits;
+        document.getElementById('credits').textContent = total_credits;
+    }));
+
+    gardenEvents.addEventListener('challenge-completed', track(({ id }) => {
+        currentChallenges.forEach(challenge => {
+            if (challenge.id === id) {
+                challenge.completed = true;
+            }
+        });
+        displayChallenges(currentChallenges);
+    }));
+
+    // Too much was missed to replay (e.g. the server restarted)
+    gardenEvents.addEventListener('resync', track(() => loadGarden()));
+
+    gardenEvents.onerror = () => {
+        // The browser's own retry would reuse the spent ticket, so
+        // reconnect with a fresh one (resuming after lastGardenEventId)
+        gardenEvents.close();
+        setTimeout(connectGardenEvents, 3000);
+    };
+}
+
 // ========== LOAD ON PAGE LOAD ==========
 initSounds();
-document.addEventListener('DOMContentLoaded', loadGarden);
+document.addEventListener('DOMContentLoaded', async () => {
+    await loadGarden();
+    connectGardenEvents();
+});
 
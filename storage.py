@@ -0,0 +1,592 @@
+"""Storage backends for Virtual Doodle Garden
+
+Every module talks to the database through the subset of the Supabase
+query builder it already uses:
+
+    sb.table(name).select(columns, count="exact")
+                  .insert(rows) / .upsert(rows, on_conflict=..., ignore_duplicates=...)
+                  .update(values) / .delete()
+                  .eq / .neq / .gt / .gte / .lt / .lte / .in_ / .is_ / .or_("...")
+                  .order(column, desc=...) / .limit(n) / .range(start, end)
+                  .execute()  -> response with .data (list of dicts) and .count
+    sb.rpc(function, params).execute()  -> response with the function's result
+
+Writes that must not race (aggregate counters, the credit ledger) are
+database functions defined in SETUP_GUIDE.md and called with rpc(). The
+SQLite backend runs the Python implementation registered for the name
+with @procedure, inside one transaction.
+
+`connect()` returns an object with that interface. STORAGE_BACKEND picks
+the implementation:
+
+    supabase  (default) the Supabase client for SUPABASE_URL
+    sqlite    SQLiteStorage, a local database with the same tables,
+              defaults and unique constraints as SETUP_GUIDE.md, so
+              benchmarks and CI can run the whole API offline
+
+The SQLite database lives in memory unless STORAGE_SQLITE_PATH names a
+file. STORAGE_LATENCY_MS adds a fixed delay to every execute() to stand
+in for the network round trip to Supabase. Row level security is not
+emulated: the local backend behaves like the service role key.
+
+Supabase returns at most 1000 rows per request (PostgREST's max-rows), so
+reads that need every row of a table, such as migrations and
+reconciliation, go through fetch_all(), which pages with range().
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", ":memory:")
+LATENCY_MS = float(os.getenv("STORAGE_LATENCY_MS", "0"))
+# Rows per fetch_all() request; must not exceed the API's max-rows
+PAGE_SIZE = 1000
+
+# The tables from README.md and SETUP_GUIDE.md in SQLite's dialect.
+# gen_random_uuid() and now() are provided by SQLiteStorage; JSON and
+# BOOLEAN columns are converted to and from Python values.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plants (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    branches INTEGER NOT NULL,
+    leaf_type TEXT NOT NULL,
+    color TEXT NOT NULL,
+    growth_stage INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT (now())
+);
+CREATE INDEX IF NOT EXISTS plants_user_created_idx
+    ON plants (user_id, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS user_achievements (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    achievement_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    emoji TEXT NOT NULL,
+    earned_at TEXT DEFAULT (now()),
+    created_at TEXT DEFAULT (now()),
+    UNIQUE (user_id, achievement_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL UNIQUE,
+    current_streak INTEGER DEFAULT 0,
+    longest_streak INTEGER DEFAULT 0,
+    total_drawings INTEGER DEFAULT 0,
+    last_draw_date TEXT,
+    tallest_plant INTEGER DEFAULT 0,
+    colors JSON DEFAULT '[]',
+    leaf_types JSON DEFAULT '[]',
+    created_at TEXT DEFAULT (now()),
+    updated_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS challenge_progress (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL UNIQUE,
+    day TEXT NOT NULL,
+    colors JSON DEFAULT '[]',
+    leaf_types JSON DEFAULT '[]',
+    completed JSON DEFAULT '[]',
+    created_at TEXT DEFAULT (now()),
+    updated_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS credit_ledger (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    quantity INTEGER DEFAULT 0,
+    ref TEXT,
+    created_at TEXT DEFAULT (now())
+);
+CREATE INDEX IF NOT EXISTS credit_ledger_user_idx ON credit_ledger (user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS credit_balances (
+    user_id TEXT PRIMARY KEY,
+    balance INTEGER DEFAULT 0,
+    plant_credits INTEGER DEFAULT 0,
+    plants INTEGER DEFAULT 0,
+    achievement_bonus INTEGER DEFAULT 0,
+    achievements INTEGER DEFAULT 0,
+    streak_bonus INTEGER DEFAULT 0,
+    streak INTEGER DEFAULT 0,
+    streak_day TEXT,
+    minigame_credits INTEGER DEFAULT 0,
+    spent_credits INTEGER DEFAULT 0,
+    updated_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS minigame_scores (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    game TEXT NOT NULL,
+    score INTEGER DEFAULT 0,
+    credits_awarded INTEGER DEFAULT 0,
+    completed BOOLEAN DEFAULT 0,
+    created_at TEXT DEFAULT (now())
+);
+CREATE INDEX IF NOT EXISTS minigame_scores_user_idx ON minigame_scores (user_id);
+
+CREATE TABLE IF NOT EXISTS user_cosmetics (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    cosmetic_id TEXT NOT NULL,
+    owned BOOLEAN DEFAULT 1,
+    created_at TEXT DEFAULT (now())
+);
+CREATE INDEX IF NOT EXISTS user_cosmetics_user_idx ON user_cosmetics (user_id, cosmetic_id);
+"""
+
+FILTER_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+# Function name -> SQLite implementation, see procedure()
+PROCEDURES = {}
+
+
+def procedure(name):
+    """Register the SQLite implementation of database function `name`.
+
+    It is called as fn(db, **params) with the SQLiteStorage and must
+    return the function's result. It runs in one transaction that no
+    other query can interleave with; its own queries go through `db`
+    like any other client's.
+    """
+    def register(fn):
+        PROCEDURES[name] = fn
+        return fn
+    return register
+
+
+class StorageError(Exception):
+    """A query the local backend rejected, with the Postgres error code"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class StorageResponse:
+    """Result of execute(): rows in `data`, total matches in `count`"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        return f"StorageResponse(data={self.data!r}, count={self.count!r})"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _split_columns(columns):
+    return [column.strip() for column in columns.split(",") if column.strip()]
+
+
+def _parse_filters(text):
+    """Parse a PostgREST or_() filter list into ("and"|"or", [...]) trees"""
+    position = 0
+
+    def parse_list(end):
+        nonlocal position
+        items = [parse_item()]
+        while position < len(text) and text[position] == ",":
+            position += 1
+            items.append(parse_item())
+        if end:
+            if position >= len(text) or text[position] != end:
+                raise StorageError(f"Malformed filter: {text}", "PGRST100")
+            position += 1
+        return items
+
+    def parse_item():
+        nonlocal position
+        for group in ("and", "or"):
+            if text.startswith(group + "(", position):
+                position += len(group) + 1
+                return group, parse_list(")")
+        column, _, rest = text[position:].partition(".")
+        op, _, rest = rest.partition(".")
+        position += len(column) + len(op) + 2
+        return "filter", (column, op, parse_value())
+
+    def parse_value():
+        nonlocal position
+        if position < len(text) and text[position] == '"':
+            value, position = [], position + 1
+            while position < len(text) and text[position] != '"':
+                if text[position] == "\\":
+                    position += 1
+                value.append(text[position])
+                position += 1
+            position += 1
+            return "".join(value)
+        start = position
+        while position < len(text) and text[position] not in ",)":
+            position += 1
+        return text[start:position]
+
+    items = parse_list(None)
+    if position != len(text):
+        raise StorageError(f"Malformed filter: {text}", "PGRST100")
+    return items
+
+
+class _Table:
+    """Column metadata for one table, read from the SQLite schema"""
+
+    def __init__(self, conn, name):
+        info = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+        if not info:
+            raise StorageError(f'relation "{name}" does not exist', "42P01")
+        self.name = name
+        self.columns = [row[1] for row in info]
+        self.json_columns = {row[1] for row in info if row[2] == "JSON"}
+        self.bool_columns = {row[1] for row in info if row[2] == "BOOLEAN"}
+        self.primary_key = [row[1] for row in sorted(info, key=lambda r: r[5]) if row[5]]
+
+    def column(self, name):
+        if name not in self.columns:
+            raise StorageError(
+                f'column {self.name}.{name} does not exist', "42703")
+        return f'"{name}"'
+
+    def to_sql(self, column, value):
+        if column in self.json_columns and value is not None:
+            return json.dumps(value)
+        if column in self.bool_columns and value is not None:
+            return int(bool(value))
+        return value
+
+    def from_sql(self, row, names):
+        record = {}
+        for name, value in zip(names, row):
+            if value is not None and name in self.json_columns:
+                value = json.loads(value)
+            elif value is not None and name in self.bool_columns:
+                value = bool(value)
+            record[name] = value
+        return record
+
+
+class _Query:
+    """One table(...) builder chain, run against SQLite on execute()"""
+
+    def __init__(self, storage, table):
+        self._storage = storage
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+
+    # Actions
+    def select(self, columns="*", count=None, **kwargs):
+        self._columns, self._count = columns, count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._action, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self._action, self._payload = "upsert", rows
+        self._on_conflict, self._ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, values, **kwargs):
+        self._action, self._payload = "update", values
+        return self
+
+    def delete(self, **kwargs):
+        self._action = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column, op, value):
+        self._filters.append(("filter", (column, op, value)))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    def or_(self, filters, **kwargs):
+        self._filters.append(("or", _parse_filters(filters)))
+        return self
+
+    # Modifiers
+    def order(self, column, desc=False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = int(size)
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._offset, self._limit = int(start), int(end) - int(start) + 1
+        return self
+
+    def execute(self):
+        return self._storage._execute(self)
+
+
+class _Call:
+    """One rpc(...) call, run on execute()"""
+
+    def __init__(self, storage, name, params):
+        self._storage = storage
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        return self._storage._call(self._name, self._params)
+
+
+class SQLiteStorage:
+    """Local stand-in for the Supabase client, backed by SQLite"""
+
+    def __init__(self, path=SQLITE_PATH, latency_ms=LATENCY_MS):
+        self.path = path
+        self.latency = latency_ms / 1000
+        # Reentrant so a procedure's own queries run inside its transaction
+        self._lock = threading.RLock()
+        self._in_procedure = threading.local()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.create_function("gen_random_uuid", 0, lambda: str(uuid.uuid4()))
+        self._conn.create_function("now", 0, _now)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._tables = {}
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        return _Call(self, name, params or {})
+
+    def _meta(self, name):
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = _Table(self._conn, name)
+        return table
+
+    def _nested(self):
+        return getattr(self._in_procedure, "active", False)
+
+    def _execute(self, query):
+        if self.latency and not self._nested():
+            time.sleep(self.latency)
+        with self._lock:
+            table = self._meta(query._table)
+            try:
+                if query._action == "select":
+                    return self._select(table, query)
+                if query._action in ("insert", "upsert"):
+                    return self._insert(table, query)
+                return self._modify(table, query)
+            except sqlite3.IntegrityError as e:
+                code = "23505" if "UNIQUE" in str(e) else "23502"
+                raise StorageError(str(e), code) from e
+            except sqlite3.Error as e:
+                raise StorageError(str(e)) from e
+
+    def _call(self, name, params):
+        fn = PROCEDURES.get(name)
+        if fn is None:
+            raise StorageError(f"function {name} does not exist", "PGRST202")
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._in_procedure.active = True
+            try:
+                result = fn(self, **params)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._in_procedure.active = False
+        return StorageResponse(result)
+
+    def _begin(self):
+        """Start a transaction unless a procedure already holds one"""
+        if not self._nested():
+            self._conn.execute("BEGIN")
+
+    def _commit(self):
+        if not self._nested():
+            self._conn.execute("COMMIT")
+
+    def _rollback(self):
+        if not self._nested():
+            self._conn.execute("ROLLBACK")
+
+    def _where(self, table, filters, joiner="AND"):
+        clauses, params = [], []
+        for kind, spec in filters:
+            if kind in ("and", "or"):
+                clause, group_params = self._where(table, spec, kind.upper())
+                clauses.append(f"({clause})")
+                params += group_params
+                continue
+            column, op, value = spec
+            name = table.column(column)
+            if op in FILTER_OPERATORS:
+                clauses.append(f"{name} {FILTER_OPERATORS[op]} ?")
+                params.append(table.to_sql(column, value))
+            elif op == "in":
+                values = value if isinstance(value, list) else \
+                    _split_columns(str(value).strip("()"))
+                clauses.append(f"{name} IN ({', '.join('?' * len(values))})" if values else "0")
+                params += [table.to_sql(column, v) for v in values]
+            elif op == "is" and str(value).lower() in ("null", "none"):
+                clauses.append(f"{name} IS NULL")
+            elif op == "is":
+                clauses.append(f"{name} IS ?")
+                params.append(int(str(value).lower() == "true"))
+            else:
+                raise StorageError(f"Unsupported filter operator: {op}", "PGRST100")
+        return f" {joiner} ".join(clauses) or "1", params
+
+    def _select(self, table, query):
+        if query._columns.strip() == "*":
+            names = table.columns
+        else:
+            names = _split_columns(query._columns)
+        select_list = ", ".join(table.column(name) for name in names)
+        where, params = self._where(table, query._filters)
+
+        sql = f'SELECT {select_list} FROM "{table.name}" WHERE {where}'
+        if query._order:
+            # Postgres puts NULLs last ascending and first descending
+            sql += " ORDER BY " + ", ".join(
+                f"{table.column(column)} {'DESC NULLS FIRST' if desc else 'ASC NULLS LAST'}"
+                for column, desc in query._order)
+        if query._limit is not None:
+            sql += f" LIMIT {query._limit}"
+        if query._offset:
+            sql += f" OFFSET {query._offset}"
+        data = [table.from_sql(row, names) for row in self._conn.execute(sql, params)]
+
+        count = None
+        if query._count:
+            count = self._conn.execute(
+                f'SELECT COUNT(*) FROM "{table.name}" WHERE {where}', params).fetchone()[0]
+        return StorageResponse(data, count)
+
+    def _insert(self, table, query):
+        rows = query._payload if isinstance(query._payload, list) else [query._payload]
+        if query._action == "upsert":
+            target = _split_columns(query._on_conflict) if query._on_conflict \
+                else table.primary_key
+            conflict = f" ON CONFLICT ({', '.join(table.column(c) for c in target)})"
+        else:
+            conflict = ""
+
+        inserted = []
+        self._begin()
+        try:
+            for row in rows:
+                names = list(row)
+                sql = (f'INSERT INTO "{table.name}" ({", ".join(table.column(n) for n in names)}) '
+                       f'VALUES ({", ".join("?" * len(names))})')
+                if conflict:
+                    # Like PostgREST, a conflicting row gets the columns sent
+                    updates = [n for n in names if n not in target] or names
+                    if query._ignore_duplicates:
+                        sql += conflict + " DO NOTHING"
+                    else:
+                        sql += conflict + " DO UPDATE SET " + ", ".join(
+                            f'"{n}" = excluded."{n}"' for n in updates)
+                sql += " RETURNING *"
+                params = [table.to_sql(n, row[n]) for n in names]
+                inserted += [table.from_sql(r, table.columns)
+                             for r in self._conn.execute(sql, params)]
+            self._commit()
+        except BaseException:
+            self._rollback()
+            raise
+        return StorageResponse(inserted)
+
+    def _modify(self, table, query):
+        where, params = self._where(table, query._filters)
+        if query._action == "update":
+            names = list(query._payload)
+            assignments = ", ".join(f"{table.column(n)} = ?" for n in names)
+            sql = f'UPDATE "{table.name}" SET {assignments} WHERE {where} RETURNING *'
+            params = [table.to_sql(n, query._payload[n]) for n in names] + params
+        else:
+            sql = f'DELETE FROM "{table.name}" WHERE {where} RETURNING *'
+        return StorageResponse([table.from_sql(row, table.columns)
+                                for row in self._conn.execute(sql, params)])
+
+
+def fetch_all(build, page_size=PAGE_SIZE):
+    """Every row of a read, fetched page_size rows at a time.
+
+    `build` returns a fresh select builder. Its order must be unique
+    (end with a key such as id), so pages neither skip nor repeat rows.
+    """
+    rows = []
+    while True:
+        page = build().range(len(rows), len(rows) + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def connect(url=None, key=None, backend=None):
+    """The storage client selected by STORAGE_BACKEND (or `backend`)"""
+    backend = backend or BACKEND
+    if backend == "sqlite":
+        return SQLiteStorage()
+    if backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+    from supabase import create_client
+    return create_client(url, key)
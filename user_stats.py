@@ -0,0 +1,248 @@
+"""Per-user aggregate stats for Virtual Doodle Garden
+
+One `user_stats` row per user holds everything /stats and /credits need
+(plant count, tallest plant, distinct colors and leaf types, last plant
+date, current and longest streak), so those routes never scan the
+`plants` table. The row is folded forward whenever /generate inserts
+plants. The fold runs inside the database (the record_plant_stats
+function in SETUP_GUIDE.md) against the locked row, so concurrent
+/generate calls for one user cannot overwrite each other's counts.
+
+Reads never write: a user without a row gets empty aggregates. Users
+who had plants before this table existed therefore need their row built
+once before deploying (a required migration), and the same command
+repairs aggregates that ever drift. It also backfills streaks.
+
+    python user_stats.py --rebuild            # every user
+    python user_stats.py --rebuild <user_id>  # one user
+"""
+import logging
+import os
+import sys
+from datetime import date, datetime
+from dotenv import load_dotenv
+
+import storage
+
+log = logging.getLogger(__name__)
+
+load_dotenv()
+
+STATS_TABLE = "user_stats"
+
+
+def empty_stats(user_id):
+    """Aggregate row for a user with no plants"""
+    return {
+        "user_id": user_id,
+        "total_drawings": 0,
+        "tallest_plant": 0,
+        "colors": [],
+        "leaf_types": [],
+        "last_draw_date": None,
+        "current_streak": 0,
+        "longest_streak": 0,
+    }
+
+
+def _plant_date(plant):
+    """UTC date (YYYY-MM-DD) a plant was created"""
+    created_at = plant.get("created_at")
+    if not created_at:
+        return datetime.utcnow().date().isoformat()
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00")).date().isoformat()
+
+
+def _advance_streak(stats, plant_date):
+    """Move the streak forward for a plant created on plant_date.
+
+    A streak counts consecutive UTC days with at least one plant. Plants
+    older than the last active day do not change it.
+    """
+    last_date = stats.get("last_draw_date")
+    if last_date and plant_date <= last_date:
+        if plant_date == last_date and not stats.get("current_streak"):
+            stats["current_streak"] = 1
+    else:
+        gap = None
+        if last_date:
+            gap = (date.fromisoformat(plant_date) - date.fromisoformat(last_date)).days
+        if gap == 1:
+            stats["current_streak"] = (stats.get("current_streak") or 0) + 1
+        else:
+            stats["current_streak"] = 1
+        stats["last_draw_date"] = plant_date
+    stats["longest_streak"] = max(stats.get("longest_streak") or 0,
+                                  stats["current_streak"])
+
+
+def current_streak(stats, today=None):
+    """The streak as of today, without looking at plant history.
+
+    The streak only counts while the user has drawn today (UTC); once a
+    day passes with no plant it has expired and reads as 0.
+    """
+    today = today or datetime.utcnow().date().isoformat()
+    if stats.get("last_draw_date") != today:
+        return 0
+    return stats.get("current_streak") or 0
+
+
+def fold_plants(stats, plants):
+    """Fold newly created plants into an aggregate row (in place)"""
+    colors = set(stats.get("colors") or [])
+    leaf_types = set(stats.get("leaf_types") or [])
+
+    for plant in plants:
+        stats["total_drawings"] = (stats.get("total_drawings") or 0) + 1
+        stats["tallest_plant"] = max(
+            stats.get("tallest_plant") or 0, plant.get("height") or 0)
+        if plant.get("color"):
+            colors.add(plant["color"])
+        if plant.get("leaf_type"):
+            leaf_types.add(plant["leaf_type"])
+        _advance_streak(stats, _plant_date(plant))
+
+    stats["colors"] = sorted(colors)
+    stats["leaf_types"] = sorted(leaf_types)
+    return stats
+
+
+def batch_totals(plants):
+    """record_plant_stats parameters for a batch of new plants"""
+    return {
+        "p_plants": len(plants),
+        "p_tallest": max((plant.get("height") or 0 for plant in plants), default=0),
+        "p_colors": sorted({plant["color"] for plant in plants if plant.get("color")}),
+        "p_leaf_types": sorted({plant["leaf_type"] for plant in plants
+                                if plant.get("leaf_type")}),
+        "p_day": max(_plant_date(plant) for plant in plants),
+    }
+
+
+@storage.procedure("record_plant_stats")
+def _record_plant_stats(db, p_user_id, p_plants, p_tallest, p_colors, p_leaf_types, p_day):
+    """SQLite version of the record_plant_stats function (SETUP_GUIDE.md)"""
+    db.table(STATS_TABLE).upsert(
+        {"user_id": p_user_id}, on_conflict="user_id", ignore_duplicates=True).execute()
+    previous = db.table(STATS_TABLE).select(
+        "*").eq("user_id", p_user_id).execute().data[0]
+    streak = {key: previous.get(key) for key in
+              ("current_streak", "longest_streak", "last_draw_date")}
+    _advance_streak(streak, p_day)
+    updated = db.table(STATS_TABLE).update({
+        "total_drawings": (previous.get("total_drawings") or 0) + p_plants,
+        "tallest_plant": max(previous.get("tallest_plant") or 0, p_tallest),
+        "colors": sorted(set(previous.get("colors") or []) | set(p_colors)),
+        "leaf_types": sorted(set(previous.get("leaf_types") or []) | set(p_leaf_types)),
+        **streak,
+        "updated_at": datetime.utcnow().isoformat(),
+    }).eq("user_id", p_user_id).execute().data[0]
+    return [{"previous": previous, "updated": updated}]
+
+
+def summarize(stats):
+    """The /stats fields derived from an aggregate row"""
+    return {
+        "total_plants": stats.get("total_drawings") or 0,
+        "tallest_plant": stats.get("tallest_plant") or 0,
+        "unique_colors": len(stats.get("colors") or []),
+        "unique_leaf_types": len(stats.get("leaf_types") or []),
+        "last_plant_date": stats.get("last_draw_date"),
+        "streak": current_streak(stats),
+        "longest_streak": stats.get("longest_streak") or 0,
+    }
+
+
+def _compute_from_plants(sb, user_id):
+    plants = storage.fetch_all(lambda: sb.table("plants").select(
+        "height, color, leaf_type, created_at").eq(
+        "user_id", user_id).order("created_at").order("id"))
+    return fold_plants(empty_stats(user_id), plants)
+
+
+def _save(sb, stats):
+    stats["updated_at"] = datetime.utcnow().isoformat()
+    sb.table(STATS_TABLE).upsert(stats, on_conflict="user_id").execute()
+
+
+def rebuild_user_stats(sb, user_id):
+    """Recompute one user's aggregates from the plants table and store them"""
+    stats = _compute_from_plants(sb, user_id)
+    _save(sb, stats)
+    return stats
+
+
+def get_user_stats(sb, user_id):
+    """Read a user's aggregate row (a single-row lookup).
+
+    Users without a row get empty aggregates; nothing is written (the
+    row is created by their first plant, or by --rebuild). If the
+    user_stats table is unavailable the aggregates are computed from
+    plants without being stored, so the caller still gets an answer.
+    """
+    try:
+        response = sb.table(STATS_TABLE).select(
+            "*").eq("user_id", user_id).limit(1).execute()
+        if response.data:
+            return response.data[0]
+        return empty_stats(user_id)
+    except Exception as e:
+        log.error("Error loading user stats: %s", e)
+        return _compute_from_plants(sb, user_id)
+
+
+def record_plants(sb, user_id, plants):
+    """Update a user's aggregates after their plants were inserted.
+
+    Counts, tallest plant, colors, leaf types and the streak are folded
+    in by one record_plant_stats call, which creates the row for a new
+    user. New plants are all from today, so the streak advances once, for
+    the newest plant's day.
+    Returns (previous, updated) rows so callers can see which counters
+    moved, or (None, None) if the update failed.
+    """
+    try:
+        response = sb.rpc("record_plant_stats", {
+            "p_user_id": user_id, **batch_totals(plants)}).execute()
+        return response.data[0]["previous"], response.data[0]["updated"]
+    except Exception as e:
+        log.error("Error updating user stats: %s", e)
+        return None, None
+
+
+def rebuild_all_user_stats(sb):
+    """Recompute every user's aggregates from the plants table"""
+    plants = storage.fetch_all(lambda: sb.table("plants").select(
+        "user_id, height, color, leaf_type, created_at").order("created_at").order("id"))
+
+    by_user = {}
+    for plant in plants:
+        by_user.setdefault(plant["user_id"], []).append(plant)
+
+    rows = [fold_plants(empty_stats(user_id), user_plants)
+            for user_id, user_plants in by_user.items()]
+    for stats in rows:
+        stats["updated_at"] = datetime.utcnow().isoformat()
+    for start in range(0, len(rows), storage.PAGE_SIZE):
+        sb.table(STATS_TABLE).upsert(
+            rows[start:start + storage.PAGE_SIZE], on_conflict="user_id").execute()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "--rebuild":
+        print(__doc__)
+        sys.exit(1)
+
+    import storage
+    # Rebuilding other users' rows needs a key that bypasses RLS
+    client = storage.connect(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY"))
+
+    if len(sys.argv) > 2:
+        rebuilt = rebuild_user_stats(client, sys.argv[2])
+        print(f"Rebuilt stats for {sys.argv[2]}: {summarize(rebuilt)}")
+    else:
+        print(f"Rebuilt stats for {rebuild_all_user_stats(client)} users")